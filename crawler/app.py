@@ -1,13 +1,21 @@
 import os
 from fastapi import FastAPI, HTTPException, Request, Depends, status
 from fastapi.responses import StreamingResponse, Response
-from pydantic import BaseModel, HttpUrl, EmailStr
+from pydantic import BaseModel, HttpUrl, EmailStr, Field
 import uvicorn
 import asyncio
-from scan import run_scan
-from rule_engine import load_rules, evaluate_rules
+from scan import run_scan, close_script_client, diff_persona_results, load_persona, persona_request_headers
+from browser_pool import BrowserPool, BROWSER_POOL_SIZE, BROWSER_POOL_CONTEXTS_PER_BROWSER
+from script_store import start_write_buffer, stop_write_buffer
+from contextlib import asynccontextmanager
+from rule_engine import evaluate_rules, get_rule_registry, rule_pack_version
+from scan_cache import get_scan_cache, cache_key
+from crawl import crawl_site, CRAWL_MAX_PAGES, CRAWL_CONCURRENCY
+from politeness import get_scheduler
+from dark_pattern import stop_batcher, warm_up, DARK_PATTERN_WARMUP
+from phash_cache import save_phash_cache
 import json
-from typing import List, Optional
+from typing import List, Literal, Optional
 from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -109,7 +117,38 @@ def auth_required(role_name: str):
         return wrapper
     return decorator
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm browsers are shared by every scan served by this worker
+    browser_pool = None
+    if BROWSER_POOL_SIZE > 0:
+        browser_pool = BrowserPool()
+        await browser_pool.start()
+    app.state.browser_pool = browser_pool
+    start_write_buffer()
+    if DARK_PATTERN_WARMUP:
+        # Load weights and run a dummy batch before serving, not on the first scan
+        try:
+            await asyncio.to_thread(warm_up)
+        except Exception as e:
+            logger.warning(f"Dark-pattern model warm-up failed: {str(e)}")
+    try:
+        yield
+    finally:
+        await stop_write_buffer()
+        if browser_pool is not None:
+            await browser_pool.close()
+        await close_script_client()
+        await get_scan_cache().aclose()
+        await get_scheduler().aclose()
+        await stop_batcher()
+        await asyncio.to_thread(save_phash_cache)
+
+def get_browser_pool() -> Optional[BrowserPool]:
+    return getattr(app.state, "browser_pool", None)
+
 app = FastAPI(
+    lifespan=lifespan,
     title="RegulaAI Scanner",
     description="API for scanning websites for GDPR compliance",
     version="0.1.0",
@@ -127,6 +166,13 @@ app = FastAPI(
 scan_duration_seconds = Histogram('scan_duration_seconds', 'Scan duration in seconds')
 violations_total = Counter('violations_total', 'Total violations by severity', ['severity'])
 badge_requests_total = Counter('badge_requests_total', 'Total badge requests')
+scan_navigation_seconds = Histogram('scan_navigation_seconds', 'Page navigation time in seconds', ['resource_blocking'])
+bytes_saved_total = Counter('scan_blocked_bytes_saved_total', 'Estimated bytes not downloaded by resource-blocking scans')
+
+def observe_scan_resources(scan_result: dict):
+    blocking = scan_result.get("resource_blocking", {})
+    scan_navigation_seconds.labels(resource_blocking=str(bool(blocking.get("enabled"))).lower()).observe(scan_result.get("navigation_ms", 0) / 1000)
+    bytes_saved_total.inc(blocking.get("bytes_saved_estimate", 0))
 
 # Assign weights to severities
 SEVERITY_WEIGHTS = {
@@ -139,9 +185,77 @@ SEVERITY_WEIGHTS = {
 def get_rule_weight(severity: str) -> int:
     return SEVERITY_WEIGHTS.get(severity, 10)
 
+def score_scan_result(scan_result: dict) -> dict:
+    observe_scan_resources(scan_result)
+    # One snapshot for the whole evaluation, even if the packs reload meanwhile
+    rules = get_rule_registry().snapshot()
+    violations = evaluate_rules(scan_result, list(rules.rules))
+    for v in violations:
+        violations_total.labels(severity=v['severity']).inc()
+    total_weight = sum(get_rule_weight(v['severity']) for v in violations)
+    score = max(0, 100 - total_weight)
+    response = scan_result.copy()
+    response["score"] = score
+    response["violations"] = violations
+    response["rule_pack_version"] = rules.version
+    return response
+
 class ScanRequest(BaseModel):
     url: HttpUrl
     persona: Optional[str] = None
+    # Skip images, media and fonts; defaults to the persona's setting
+    block_resources: Optional[bool] = None
+    # 'banner_settled' for latency-sensitive traffic; defaults to SCAN_WAIT_STRATEGY
+    wait_strategy: Optional[Literal["networkidle", "banner_settled"]] = None
+    classify_mode: Optional[Literal["full", "roi"]] = None
+    # Oldest cached result (in seconds) the caller accepts; force_refresh always rescans
+    max_age: Optional[int] = Field(None, ge=0)
+    force_refresh: bool = False
+
+async def cached_scan(scan_req: ScanRequest, check_robots: bool = False) -> dict:
+    """
+    Scored scan result for `scan_req`, served from the scan cache when fresh
+    enough. Cache misses go through the per-host politeness scheduler;
+    `check_robots` also refuses URLs that robots.txt disallows.
+    """
+    url = str(scan_req.url)
+    key = cache_key(url, scan_req.persona, rule_pack_version(), block_resources=scan_req.block_resources, wait_strategy=scan_req.wait_strategy, classify_mode=scan_req.classify_mode)
+
+    async def scan_and_score():
+        async with get_scheduler().slot(url, check_robots=check_robots):
+            with scan_duration_seconds.time():
+                scan_result = await run_scan(url, persona_id=scan_req.persona, pool=get_browser_pool(), block_resources=scan_req.block_resources, wait_strategy=scan_req.wait_strategy, classify_mode=scan_req.classify_mode)
+        return score_scan_result(scan_result)
+
+    # Revalidate as the persona, so a 304 is about the variant it was served; a proxied
+    # persona's variant cannot be reproduced from here, so its stale entries are rescanned
+    persona = load_persona(scan_req.persona) if scan_req.persona else {}
+    payload, cache_info = await get_scan_cache().get_or_scan(
+        key, url, scan_and_score, max_age=scan_req.max_age, force_refresh=scan_req.force_refresh,
+        headers=persona_request_headers(persona), revalidate="proxy" not in persona
+    )
+    response = payload.copy()
+    response["cache"] = cache_info
+    return response
+
+class PersonaScanRequest(BaseModel):
+    url: HttpUrl
+    # All personas share one pooled browser, so they must fit in its contexts
+    personas: List[str] = Field(..., min_length=1, max_length=BROWSER_POOL_CONTEXTS_PER_BROWSER)
+    block_resources: Optional[bool] = None
+    wait_strategy: Optional[Literal["networkidle", "banner_settled"]] = None
+    classify_mode: Optional[Literal["full", "roi"]] = None
+
+class CrawlRequest(BaseModel):
+    url: HttpUrl
+    max_pages: int = Field(50, ge=1, le=CRAWL_MAX_PAGES)
+    concurrency: int = Field(CRAWL_CONCURRENCY, ge=1, le=32)
+    # Seed the frontier from the site's sitemap.xml (or `url` itself when it is a sitemap)
+    sitemap: bool = False
+    persona: Optional[str] = None
+    block_resources: Optional[bool] = None
+    wait_strategy: Optional[Literal["networkidle", "banner_settled"]] = None
+    classify_mode: Optional[Literal["full", "roi"]] = None
 
 class BatchScanRequest(BaseModel):
     scans: List[ScanRequest]
@@ -231,17 +345,9 @@ async def scan_endpoint(request: ScanRequest, current_user: User = Depends(get_c
         db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update scan quota.")
     try:
-        with scan_duration_seconds.time():
-            scan_result = await run_scan(str(request.url), persona_id=request.persona)
-        rules = load_rules()
-        violations = evaluate_rules(scan_result, rules)
-        for v in violations:
-            violations_total.labels(severity=v['severity']).inc()
-        total_weight = sum(get_rule_weight(v['severity']) for v in violations)
-        score = max(0, 100 - total_weight)
-        response = scan_result.copy()
-        response["score"] = score
-        response["violations"] = violations
+        response = await cached_scan(request)
+        score = response["score"]
+        violations = response["violations"]
         
         # Check for high-severity violations and send notifications
         high_severity_violations = [
@@ -269,23 +375,134 @@ async def scan_endpoint(request: ScanRequest, current_user: User = Depends(get_c
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/scan/personas", tags=["Scans"])
+@auth_required("viewer")
+async def persona_scan_endpoint(request: PersonaScanRequest, current_user: User = Depends(get_current_user_or_apikey), db: Session = Depends(get_db), raw_request: Request = Depends()):
+    """Scan one URL as several personas on a single browser and report what differs between them."""
+    for persona_id in request.personas:
+        try:
+            load_persona(persona_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    # Enforce quota: each persona counts as one scan
+    org = db.query(Organisation).filter(Organisation.id == current_user.organisation_id).with_for_update().first()
+    if not org:
+        raise HTTPException(status_code=404, detail="Organisation not found")
+    if org.remaining_scans_month < len(request.personas):  # type: ignore[operator]
+        raise HTTPException(status_code=402, detail="Scan quota exceeded. Please upgrade your plan or wait for reset.")
+    try:
+        org.remaining_scans_month -= len(request.personas)  # type: ignore[assignment]
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to update scan quota.")
+    try:
+        with scan_duration_seconds.time():
+            fanout = await run_scan(str(request.url), persona_ids=request.personas, pool=get_browser_pool(), block_resources=request.block_resources, wait_strategy=request.wait_strategy, classify_mode=request.classify_mode)
+        results = {
+            persona_id: result if "error" in result else score_scan_result(result)
+            for persona_id, result in fanout["personas"].items()
+        }
+        response = {
+            "url": fanout["url"],
+            "personas": results,
+            # Recomputed so the diff covers rule violations, not only dark patterns
+            "diff": diff_persona_results(results),
+            "scan_time_ms": fanout["scan_time_ms"]
+        }
+        log_audit(
+            event="persona_scan",
+            user_id=current_user.id,  # type: ignore[arg-type]
+            meta={"url": str(request.url), "personas": request.personas, "diff": response["diff"]},
+            ip=raw_request.client.host if raw_request and raw_request.client else None
+        )
+        return response
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def refund_scans(organisation_id: int, scans: int):
+    """Return unused scans to an organisation's monthly quota."""
+    if scans <= 0:
+        return
+    # The request's session is not guaranteed to outlive a streamed response
+    db = SessionLocal()
+    try:
+        org = db.query(Organisation).filter(Organisation.id == organisation_id).with_for_update().first()
+        if org:
+            org.remaining_scans_month += scans  # type: ignore[assignment]
+            db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logger.error(f"Failed to refund {scans} scans to organisation {organisation_id}: {str(e)}")
+    finally:
+        db.close()
+
+@app.post("/crawl", tags=["Scans"])
+@auth_required("viewer")
+async def crawl_endpoint(request: CrawlRequest, current_user: User = Depends(get_current_user_or_apikey), db: Session = Depends(get_db), raw_request: Request = Depends()):
+    """Crawl same-site pages and stream per-page results followed by a site-level summary as NDJSON."""
+    # Enforce quota: the whole page budget is reserved up front and pages not scanned are refunded
+    org = db.query(Organisation).filter(Organisation.id == current_user.organisation_id).with_for_update().first()
+    if not org:
+        raise HTTPException(status_code=404, detail="Organisation not found")
+    if org.remaining_scans_month < request.max_pages:  # type: ignore[operator]
+        raise HTTPException(status_code=402, detail="Scan quota exceeded. Please upgrade your plan or wait for reset.")
+    try:
+        org.remaining_scans_month -= request.max_pages  # type: ignore[assignment]
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to update scan quota.")
+    organisation_id = current_user.organisation_id
+    user_id = current_user.id
+    ip = raw_request.client.host if raw_request and raw_request.client else None
+
+    async def ndjson_stream():
+        pages = 0
+        summary = None
+        try:
+            async for item in crawl_site(
+                str(request.url),
+                max_pages=request.max_pages,
+                concurrency=request.concurrency,
+                pool=get_browser_pool(),
+                scheduler=get_scheduler(),
+                use_sitemap=request.sitemap,
+                score_fn=score_scan_result,
+                persona_id=request.persona,
+                block_resources=request.block_resources,
+                wait_strategy=request.wait_strategy,
+                classify_mode=request.classify_mode
+            ):
+                if item["type"] == "page":
+                    pages += 1
+                else:
+                    summary = item
+                yield json.dumps(item) + "\n"
+        finally:
+            # Also runs when the client disconnects mid-crawl
+            refund_scans(organisation_id, request.max_pages - pages)  # type: ignore[arg-type]
+            log_audit(
+                event="crawl",
+                user_id=user_id,  # type: ignore[arg-type]
+                meta={
+                    "url": str(request.url),
+                    "max_pages": request.max_pages,
+                    "pages": pages,
+                    "completed": summary is not None,
+                    "violations": [v["id"] for v in summary.get("violations", [])] if summary else [],
+                },
+                ip=ip
+            )
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
 @app.post("/batch_scan", tags=["Scans"])
 @auth_required("viewer")
 async def batch_scan_endpoint(request: BatchScanRequest, current_user: User = Depends(get_current_user_or_apikey)):
     async def scan_and_serialize(scan_req: ScanRequest):
         try:
-            with scan_duration_seconds.time():
-                scan_result = await run_scan(str(scan_req.url), persona_id=scan_req.persona)
-            rules = load_rules()
-            violations = evaluate_rules(scan_result, rules)
-            for v in violations:
-                violations_total.labels(severity=v['severity']).inc()
-            total_weight = sum(get_rule_weight(v['severity']) for v in violations)
-            score = max(0, 100 - total_weight)
-            response = scan_result.copy()
-            response["score"] = score
-            response["violations"] = violations
-            return json.dumps(response)
+            return json.dumps(await cached_scan(scan_req, check_robots=True))
         except Exception as e:
             return json.dumps({"url": str(scan_req.url), "error": str(e)})
 
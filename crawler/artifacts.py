@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import zstandard  # type: ignore[import]
+except ImportError:
+    zstandard = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_BACKEND = os.getenv("ARTIFACT_BACKEND", "local")  # 'local' or 's3'
+ARTIFACT_DIR = os.getenv("ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "regulaai-artifacts"))
+ARTIFACT_MAX_BYTES = int(os.getenv("ARTIFACT_MAX_BYTES", str(2 * 1024 ** 3)))
+ARTIFACT_S3_BUCKET = os.getenv("ARTIFACT_S3_BUCKET", "regulaai-artifacts")
+ARTIFACT_S3_PREFIX = os.getenv("ARTIFACT_S3_PREFIX", "artifacts/")
+# Point at MinIO or another S3-compatible stand-in for local development
+ARTIFACT_S3_ENDPOINT_URL = os.getenv("ARTIFACT_S3_ENDPOINT_URL")
+
+ZSTD_EXT = ".zst"
+GZIP_EXT = ".gz"
+
+
+def compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def decompress(data: bytes, ext: str) -> bytes:
+    if ext == ZSTD_EXT:
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst artifacts")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class LocalArtifactBackend:
+    """Artifacts on local disk, evicted least-recently-used once `max_bytes` is exceeded."""
+
+    def __init__(self, root: str = ARTIFACT_DIR, max_bytes: int = ARTIFACT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _load_index(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(dirpath, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, os.path.relpath(path, self.root), stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return True
+            return False
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent scans never observe a partial file
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            self._evict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            os.utime(path)
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            # Evicted by another worker sharing the directory since we indexed it
+            with self._lock:
+                self._total -= self._entries.pop(key, 0)
+            return None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _evict(self):
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+
+class S3ArtifactBackend:
+    """Artifacts in an S3-compatible bucket; retention is left to bucket lifecycle rules."""
+
+    def __init__(self, bucket: str = ARTIFACT_S3_BUCKET, prefix: str = ARTIFACT_S3_PREFIX, endpoint_url: Optional[str] = ARTIFACT_S3_ENDPOINT_URL):
+        try:
+            import boto3  # type: ignore[import]
+        except ImportError:
+            raise RuntimeError("boto3 is required for the s3 artifact backend")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def put(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"].read()
+        except self.client.exceptions.NoSuchKey:
+            return None
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for scan artifacts. Artifacts are referenced as
+    'sha256:<hex digest>' of the uncompressed bytes, so identical pages and
+    screenshots across scans are stored once.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(digest: str, ext: str) -> str:
+        return f"{digest[:2]}/{digest}{ext}"
+
+    def put(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        if not any(self.backend.exists(self._key(digest, ext)) for ext in (ZSTD_EXT, GZIP_EXT)):
+            ext = ZSTD_EXT if zstandard is not None else GZIP_EXT
+            self.backend.put(self._key(digest, ext), compress(data))
+        return f"sha256:{digest}"
+
+    def get(self, ref: str) -> Optional[bytes]:
+        digest = ref.split(":", 1)[-1]
+        for ext in (ZSTD_EXT, GZIP_EXT):
+            data = self.backend.get(self._key(digest, ext))
+            if data is not None:
+                return decompress(data, ext)
+        return None
+
+
+_store: Optional[ArtifactStore] = None
+
+
+def get_artifact_store() -> ArtifactStore:
+    global _store
+    if _store is None:
+        if ARTIFACT_BACKEND == "s3":
+            _store = ArtifactStore(S3ArtifactBackend())
+        elif ARTIFACT_BACKEND == "local":
+            _store = ArtifactStore(LocalArtifactBackend())
+        else:
+            raise ValueError(f"Unknown artifact backend '{ARTIFACT_BACKEND}'")
+    return _store
@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+from prometheus_client import Counter, Gauge, Histogram
+
+try:
+    import psutil  # type: ignore[import]
+except ImportError:
+    psutil = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+BROWSER_POOL_CONTEXTS_PER_BROWSER = int(os.getenv("BROWSER_POOL_CONTEXTS_PER_BROWSER", "8"))
+BROWSER_POOL_MAX_SCANS_PER_BROWSER = int(os.getenv("BROWSER_POOL_MAX_SCANS_PER_BROWSER", "200"))
+BROWSER_POOL_MAX_RSS_MB = int(os.getenv("BROWSER_POOL_MAX_RSS_MB", "1536"))
+
+# Prometheus metrics
+pool_browsers = Gauge('browser_pool_browsers', 'Warm browsers held by the pool')
+pool_capacity = Gauge('browser_pool_capacity', 'Concurrent scan slots offered by the pool')
+pool_in_use = Gauge('browser_pool_in_use', 'Scan slots currently leased')
+pool_saturation = Gauge('browser_pool_saturation', 'Fraction of scan slots currently leased')
+pool_wait_seconds = Histogram(
+    'browser_pool_wait_seconds', 'Time spent waiting for a browser slot',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+pool_recycles_total = Counter('browser_pool_recycles_total', 'Browsers recycled by the pool', ['reason'])
+
+
+class _PooledBrowser:
+    def __init__(self, browser: Browser, marker: str):
+        self.browser = browser
+        self.marker = marker
+        self.pid: Optional[int] = None
+        self.active = 0
+        self.scans = 0
+        self.retiring = False
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of warm Chromium browsers and leases a fresh,
+    isolated context per scan. A browser is replaced once it has served
+    `max_scans_per_browser` scans or its process tree exceeds `max_rss_mb`;
+    the old one drains its in-flight scans before being closed.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        contexts_per_browser: int = BROWSER_POOL_CONTEXTS_PER_BROWSER,
+        max_scans_per_browser: int = BROWSER_POOL_MAX_SCANS_PER_BROWSER,
+        max_rss_mb: int = BROWSER_POOL_MAX_RSS_MB,
+        headless: bool = True,
+    ):
+        if size < 1 or contexts_per_browser < 1:
+            raise ValueError("Browser pool size and contexts per browser must be positive")
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.max_scans_per_browser = max_scans_per_browser
+        self.max_rss_mb = max_rss_mb
+        self.headless = headless
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[_PooledBrowser] = []
+        self._draining: List[_PooledBrowser] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = asyncio.Lock()
+        # Signalled under _lock whenever replacement browsers join the pool
+        self._replaced = asyncio.Condition(self._lock)
+        self._fanout_lock = asyncio.Lock()
+        self._in_use = 0
+        self._launching = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.size * self.contexts_per_browser
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Semaphore(self.capacity)
+        self._browsers = list(await asyncio.gather(*(self._launch() for _ in range(self.size))))
+        pool_capacity.set(self.capacity)
+        self._update_gauges()
+        logger.info(f"Browser pool started with {self.size} browsers, capacity {self.capacity}")
+
+    async def close(self):
+        for pooled in self._browsers + self._draining:
+            await self._close_browser(pooled)
+        self._browsers = []
+        self._draining = []
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def context(self, **context_args) -> AsyncIterator[BrowserContext]:
+        """Lease a slot on a warm browser and yield a fresh context on it."""
+        if self._slots is None:
+            raise RuntimeError("Browser pool has not been started")
+        wait_start = time.perf_counter()
+        await self._slots.acquire()
+        pool_wait_seconds.observe(time.perf_counter() - wait_start)
+        pooled = None
+        try:
+            pooled = await self._checkout()
+            context = await pooled.browser.new_context(**context_args)
+            try:
+                yield context
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        finally:
+            if pooled is not None:
+                await self._checkin(pooled)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def contexts(self, context_args_list: List[dict]) -> AsyncIterator[List[BrowserContext]]:
+        """
+        Lease one slot per entry of `context_args_list` and yield that many
+        fresh contexts, all on the same warm browser. The browser may go past
+        `contexts_per_browser` for the duration; total leases stay within capacity.
+        """
+        if self._slots is None:
+            raise RuntimeError("Browser pool has not been started")
+        count = len(context_args_list)
+        if count > self.capacity:
+            raise ValueError(f"Cannot lease {count} contexts from a pool of capacity {self.capacity}")
+        wait_start = time.perf_counter()
+        # Only one multi-slot lease acquires at a time, so partial leases cannot deadlock
+        acquired = 0
+        try:
+            async with self._fanout_lock:
+                while acquired < count:
+                    await self._slots.acquire()
+                    acquired += 1
+        except BaseException:
+            for _ in range(acquired):
+                self._slots.release()
+            raise
+        pool_wait_seconds.observe(time.perf_counter() - wait_start)
+        pooled = None
+        contexts: List[BrowserContext] = []
+        try:
+            pooled = await self._checkout(count)
+            for context_args in context_args_list:
+                contexts.append(await pooled.browser.new_context(**context_args))
+            yield contexts
+        finally:
+            for context in contexts:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            if pooled is not None:
+                await self._checkin(pooled, count)
+            for _ in range(count):
+                self._slots.release()
+
+    async def _launch(self) -> _PooledBrowser:
+        assert self._playwright is not None
+        # Chromium ignores unknown switches, which lets us find the process tree for RSS checks
+        marker = uuid.uuid4().hex
+        browser = await self._playwright.chromium.launch(
+            headless=self.headless,
+            args=[f"--regulaai-pool-id={marker}"]
+        )
+        return _PooledBrowser(browser, marker)
+
+    async def _checkout(self, count: int = 1) -> _PooledBrowser:
+        async with self._lock:
+            to_close = [b for b in self._browsers if not b.browser.is_connected()]
+            for pooled in to_close:
+                pool_recycles_total.labels(reason="disconnected").inc()
+                self._retire(pooled)
+            to_close = [b for b in to_close if b.active == 0]
+            missing = self._claim_missing()
+        for pooled in to_close:
+            await self._close_browser(pooled)
+        if missing:
+            await self._replenish(missing)
+        async with self._replaced:
+            # Another lease may still be launching the only replacement
+            await self._replaced.wait_for(lambda: self._browsers or not self._launching)
+            if not self._browsers:
+                raise RuntimeError("No browser available in the pool")
+            candidates = [b for b in self._browsers if b.active + count <= self.contexts_per_browser]
+            pooled = min(candidates or self._browsers, key=lambda b: b.active)
+            pooled.active += count
+            self._in_use += count
+            self._update_gauges()
+            return pooled
+
+    async def _checkin(self, pooled: _PooledBrowser, count: int = 1):
+        reason = None
+        rss_mb = 0.0 if pooled.retiring else await self._rss_mb(pooled)
+        async with self._lock:
+            pooled.active -= count
+            pooled.scans += count
+            self._in_use -= count
+            if not pooled.retiring:
+                if pooled.scans >= self.max_scans_per_browser:
+                    reason = "max_scans"
+                elif rss_mb > self.max_rss_mb:
+                    reason = "rss"
+                if reason is not None:
+                    pool_recycles_total.labels(reason=reason).inc()
+                    self._retire(pooled)
+            close_now = pooled.retiring and pooled.active == 0
+            if close_now and pooled in self._draining:
+                self._draining.remove(pooled)
+            missing = self._claim_missing()
+            self._update_gauges()
+        if close_now:
+            await self._close_browser(pooled)
+        if missing:
+            await self._replenish(missing)
+
+    def _retire(self, pooled: _PooledBrowser):
+        """Take a browser out of rotation; it drains until its last lease is checked in. Call under _lock."""
+        pooled.retiring = True
+        self._browsers.remove(pooled)
+        if pooled.active > 0:
+            self._draining.append(pooled)
+
+    def _claim_missing(self) -> int:
+        """Number of browsers the caller must launch to bring the pool back to size. Call under _lock."""
+        missing = max(0, self.size - len(self._browsers) - self._launching)
+        self._launching += missing
+        return missing
+
+    async def _replenish(self, count: int):
+        """Launch `count` browsers without holding the lock and add them to the pool."""
+        results: list = []
+        try:
+            results = await asyncio.gather(*(self._launch() for _ in range(count)), return_exceptions=True)
+        finally:
+            async with self._replaced:
+                self._launching -= count
+                for result in results:
+                    if isinstance(result, BaseException):
+                        # The slot stays empty; the next checkout launches it again
+                        logger.error(f"Failed to launch pooled browser: {str(result)}")
+                    else:
+                        self._browsers.append(result)
+                self._update_gauges()
+                self._replaced.notify_all()
+
+    async def _rss_mb(self, pooled: _PooledBrowser) -> float:
+        if psutil is None or self.max_rss_mb <= 0:
+            return 0.0
+        return await asyncio.to_thread(_process_tree_rss_mb, pooled)
+
+    async def _close_browser(self, pooled: _PooledBrowser):
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"Failed to close pooled browser: {str(e)}")
+
+    def _update_gauges(self):
+        pool_browsers.set(len(self._browsers) + len(self._draining))
+        pool_in_use.set(self._in_use)
+        pool_saturation.set(self._in_use / self.capacity if self._browsers else 0)
+
+
+def _process_tree_rss_mb(pooled: _PooledBrowser) -> float:
+    try:
+        if pooled.pid is None:
+            flag = f"--regulaai-pool-id={pooled.marker}"
+            for proc in psutil.process_iter(['pid', 'cmdline']):
+                if flag in (proc.info.get('cmdline') or []):
+                    pooled.pid = proc.info['pid']
+                    break
+            else:
+                return 0.0
+        root = psutil.Process(pooled.pid)
+        rss = root.memory_info().rss
+        for child in root.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss / (1024 * 1024)
+    except psutil.Error:
+        return 0.0
@@ -0,0 +1,112 @@
+"""
+Compiler for declarative rule conditions (`condition: {type, value, ...}` in
+rule_packs/schema.json).
+
+A condition states what a compliant page looks like; `value` is the expected
+outcome of the check named by `type`. Each condition compiles into a
+predicate over the scan result and its feature view (features.py) that
+returns True when the page violates it, so packs in this format stay pure
+data and never execute code. Lookups go through the view's indexes, so a
+check costs the size of its option lists rather than of the result.
+
+    {"type": "cookie_banner", "value": true}
+        a consent banner is shown
+    {"type": "cookie_presence", "value": false, "names": ["_ga"]}
+        no cookies (or none of `names`) are set
+    {"type": "third_party_domain", "value": false, "domains": ["facebook.net"]}
+        no third-party hosts (or none under `domains`) are contacted
+    {"type": "script_presence", "value": false, "scripts": ["googletagmanager.com"]}
+        no script matches `scripts` (a domain, a URL substring or a sha256)
+    {"type": "robots_meta", "value": false, "directive": "noindex"}
+        the robots meta tag is absent (or lacks `directive`)
+"""
+import re
+from typing import Any, Callable, Dict, List
+
+# (scan result, feature view) -> violated
+Predicate = Callable[[dict, dict], bool]
+
+SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class ConditionError(ValueError):
+    """Raised when a condition does not match the schema."""
+
+
+def _strings(condition: dict, key: str, required: bool = False) -> List[str]:
+    values = condition.get(key)
+    if values is None:
+        if required:
+            raise ConditionError(f"'{condition['type']}' needs a '{key}' list")
+        return []
+    if not isinstance(values, list) or not values or not all(isinstance(v, str) and v for v in values):
+        raise ConditionError(f"'{key}' must be a non-empty list of strings")
+    return [v.lower() for v in values]
+
+
+def _cookie_banner(condition: dict) -> Predicate:
+    return lambda result, features: bool(result.get("cookie_banner_detected"))
+
+
+def _cookie_presence(condition: dict) -> Predicate:
+    names = _strings(condition, "names")
+    if not names:
+        return lambda result, features: features["counts"]["cookies"] > 0
+    return lambda result, features: any(name in features["cookie_names"] for name in names)
+
+
+def _third_party_domain(condition: dict) -> Predicate:
+    domains = _strings(condition, "domains")
+    if not domains:
+        return lambda result, features: features["counts"]["third_party_hosts"] > 0
+    return lambda result, features: any(d in features["third_party_parents"] for d in domains)
+
+
+def _script_presence(condition: dict) -> Predicate:
+    patterns = _strings(condition, "scripts", required=True)
+    hashes = {p for p in patterns if SHA256_PATTERN.match(p)}
+    # Bare domains match the script host and its subdomains; anything else is a URL substring
+    domains = [p for p in patterns if p not in hashes and "/" not in p]
+    fragments = [p for p in patterns if p not in hashes and p not in domains]
+
+    def check(result: dict, features: dict) -> bool:
+        if any(h in features["script_hashes"] for h in hashes) or any(d in features["script_parents"] for d in domains):
+            return True
+        # Substrings have no index; only these scan the script URLs
+        return any(f in url for f in fragments for url in features["script_urls"])
+    return check
+
+
+def _robots_meta(condition: dict) -> Predicate:
+    directive = condition.get("directive")
+    if directive is None:
+        return lambda result, features: bool(result.get("robots_meta"))
+    if not isinstance(directive, str) or not directive.strip():
+        raise ConditionError("'directive' must be a non-empty string")
+    directive = directive.strip().lower()
+    return lambda result, features: directive in features["robots_directives"]
+
+
+CHECKS: Dict[str, Callable[[dict], Predicate]] = {
+    "cookie_banner": _cookie_banner,
+    # The schema's older name for the banner check
+    "cookie_consent": _cookie_banner,
+    "cookie_presence": _cookie_presence,
+    "third_party_domain": _third_party_domain,
+    "script_presence": _script_presence,
+    "robots_meta": _robots_meta,
+}
+
+
+def compile_condition(condition: Any) -> Predicate:
+    """Predicate that is True when a scan result violates `condition`."""
+    if not isinstance(condition, dict):
+        raise ConditionError("condition must be an object")
+    kind = condition.get("type")
+    if kind not in CHECKS:
+        raise ConditionError(f"unknown condition type {kind!r}")
+    expected = condition.get("value")
+    if not isinstance(expected, bool):
+        raise ConditionError("'value' must be true or false")
+    check = CHECKS[kind](condition)
+    return lambda result, features: check(result, features) != expected
@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import defusedxml.ElementTree as ET
+import httpx
+from defusedxml import DefusedXmlException
+
+from browser_pool import BrowserPool
+from domains import site_of_host
+from politeness import HostScheduler
+from scan import run_scan, log_event
+from urls import normalize_url
+
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "500"))
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+# Links kept waiting in the frontier, per page of budget
+CRAWL_FRONTIER_FACTOR = 10
+CRAWL_SITEMAP_TIMEOUT_MS = int(os.getenv("CRAWL_SITEMAP_TIMEOUT_MS", "10000"))
+CRAWL_MAX_SITEMAPS = 20
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+# Not worth rendering in a browser
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".zip", ".gz", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp",
+    ".mp4", ".mp3", ".webm", ".css", ".js", ".xml", ".ico", ".woff", ".woff2",
+)
+
+
+class VisitedSet:
+    """
+    Bloom filter over normalized URLs. Memory is fixed by `capacity` and
+    `error_rate` no matter how many links a site has; a false positive only
+    means a page is skipped.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+def site_of(url: str) -> str:
+    return site_of_host(urlsplit(url).hostname or "")
+
+
+def is_crawlable(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and not parts.path.lower().endswith(SKIPPED_EXTENSIONS)
+
+
+async def fetch_sitemap_urls(sitemap_url: str, limit: int) -> List[str]:
+    """Page URLs listed in a sitemap, following sitemap indexes up to CRAWL_MAX_SITEMAPS files."""
+    urls: List[str] = []
+    sitemaps = deque([sitemap_url])
+    fetched = 0
+    async with httpx.AsyncClient(timeout=CRAWL_SITEMAP_TIMEOUT_MS / 1000, follow_redirects=True) as client:
+        while sitemaps and fetched < CRAWL_MAX_SITEMAPS and len(urls) < limit:
+            fetched += 1
+            current = sitemaps.popleft()
+            try:
+                resp = await client.get(current)
+                resp.raise_for_status()
+                root = ET.fromstring(resp.content)
+            except (httpx.HTTPError, ET.ParseError, DefusedXmlException) as e:
+                log_event("sitemap_failed", url=current, error=str(e))
+                continue
+            for loc in root.iter(f"{SITEMAP_NS}loc"):
+                if not loc.text:
+                    continue
+                if root.tag == f"{SITEMAP_NS}sitemapindex":
+                    sitemaps.append(loc.text.strip())
+                elif len(urls) < limit:
+                    urls.append(loc.text.strip())
+    return urls
+
+
+class SiteAggregate:
+    """Site-level summary built incrementally so page results need not be kept."""
+
+    def __init__(self, start_url: str):
+        self.start_url = start_url
+        self.pages_scanned = 0
+        self.pages_failed = 0
+        self.pages_with_banner = 0
+        self.third_party_domains = set()
+        self.cookie_names = set()
+        self.tracker_categories: Dict[str, set] = {}
+        self.violations: Dict[str, dict] = {}
+        self.scores: List[int] = []
+
+    def add(self, page: dict):
+        if "error" in page:
+            self.pages_failed += 1
+            return
+        self.pages_scanned += 1
+        if page.get("cookie_banner_detected"):
+            self.pages_with_banner += 1
+        self.third_party_domains.update(page.get("third_party_domains", []))
+        self.cookie_names.update(c["name"] for c in page.get("cookies", []))
+        for category, domains in page.get("tracker_categories", {}).items():
+            self.tracker_categories.setdefault(category, set()).update(domains)
+        if "score" in page:
+            self.scores.append(page["score"])
+        for v in page.get("violations", []):
+            entry = self.violations.setdefault(v["id"], {
+                "id": v["id"],
+                "description": v.get("description"),
+                "severity": v.get("severity"),
+                "pages": 0,
+                "example_urls": []
+            })
+            entry["pages"] += 1
+            if len(entry["example_urls"]) < 5:
+                entry["example_urls"].append(page["url"])
+
+    def summary(self, scan_time_ms: int) -> dict:
+        return {
+            "url": self.start_url,
+            "pages_scanned": self.pages_scanned,
+            "pages_failed": self.pages_failed,
+            "pages_with_banner": self.pages_with_banner,
+            "third_party_domains": sorted(self.third_party_domains),
+            "cookie_names": sorted(self.cookie_names),
+            "tracker_categories": {category: sorted(domains) for category, domains in self.tracker_categories.items()},
+            "violations": sorted(self.violations.values(), key=lambda v: -v["pages"]),
+            "min_score": min(self.scores) if self.scores else None,
+            "avg_score": round(sum(self.scores) / len(self.scores), 1) if self.scores else None,
+            "scan_time_ms": scan_time_ms
+        }
+
+
+async def crawl_site(
+    start_url: str,
+    max_pages: int = CRAWL_MAX_PAGES,
+    concurrency: int = CRAWL_CONCURRENCY,
+    pool: Optional[BrowserPool] = None,
+    scheduler: Optional[HostScheduler] = None,
+    use_sitemap: bool = False,
+    score_fn: Optional[Callable[[dict], dict]] = None,
+    **scan_options
+) -> AsyncIterator[dict]:
+    """
+    Crawl same-site pages from `start_url` (and optionally its sitemap),
+    scanning up to `max_pages` pages with at most `concurrency` in flight.
+    Yields {"type": "page", ...} per scanned page and a final
+    {"type": "site", ...} aggregate. With a `scheduler`, page loads follow its
+    per-host limits and pages disallowed by robots.txt come back as errors.
+    """
+    start_time = time.time()
+    start_url = normalize_url(start_url)
+    site = site_of(start_url)
+    max_frontier = max_pages * CRAWL_FRONTIER_FACTOR
+    visited = VisitedSet(capacity=max(10000, max_frontier * 10))
+    frontier: deque = deque()
+    aggregate = SiteAggregate(start_url)
+
+    def enqueue(url: str):
+        url = normalize_url(url)
+        if len(frontier) >= max_frontier or not is_crawlable(url) or site_of(url) != site or url in visited:
+            return
+        visited.add(url)
+        frontier.append(url)
+
+    enqueue(start_url)
+    if use_sitemap:
+        parts = urlsplit(start_url)
+        sitemap_url = start_url if parts.path.endswith(".xml") else f"{parts.scheme}://{parts.netloc}/sitemap.xml"
+        for url in await fetch_sitemap_urls(sitemap_url, max_frontier):
+            enqueue(url)
+
+    own_pool = None
+    if pool is None:
+        # Every page of the crawl shares one browser
+        own_pool = pool = BrowserPool(size=1, contexts_per_browser=concurrency)
+        await pool.start()
+
+    async def scan_page(url: str) -> dict:
+        try:
+            if scheduler is None:
+                result = await run_scan(url, pool=pool, collect_links=True, **scan_options)
+            else:
+                async with scheduler.slot(url):
+                    result = await run_scan(url, pool=pool, collect_links=True, **scan_options)
+            return score_fn(result) if score_fn else result
+        except Exception as e:
+            return {"url": url, "error": str(e)}
+
+    log_event("crawl_started", url=start_url, max_pages=max_pages)
+    scheduled = 0
+    pending = set()
+    try:
+        while frontier or pending:
+            while frontier and len(pending) < concurrency and scheduled < max_pages:
+                scheduled += 1
+                pending.add(asyncio.create_task(scan_page(frontier.popleft())))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                page = task.result()
+                for link in page.pop("links", []):
+                    enqueue(link)
+                aggregate.add(page)
+                yield {"type": "page", **page}
+        scan_time_ms = int((time.time() - start_time) * 1000)
+        log_event("crawl_completed", duration_ms=scan_time_ms, url=start_url, pages=aggregate.pages_scanned)
+        yield {"type": "site", **aggregate.summary(scan_time_ms)}
+    finally:
+        for task in pending:
+            task.cancel()
+        # Let cancelled scans release their contexts before the pool goes away
+        await asyncio.gather(*pending, return_exceptions=True)
+        if own_pool is not None:
+            await own_pool.close()
@@ -8,44 +8,196 @@ LABELS = [
 ]
 
 # 3) Stub classify(img) using a lightweight ViT model from Hugging Face
-from typing import Dict
-from PIL import Image
-import torch
-from transformers import ViTImageProcessor, ViTForImageClassification
-import numpy as np
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import asyncio
+import logging
 import os
+import sys
+import time
+
+# torch, transformers and numpy are imported on first classification so that
+# importing this module (and scan.py, app.py, the Lambda handler) stays cheap
+if TYPE_CHECKING:
+    from PIL import Image
+    from inference import MicroBatcher
+
+logger = logging.getLogger(__name__)
 
 # Download model weights on first run
 MODEL_NAME = "nateraw/vit-base-patch16-224-in21k"
+# "torch" (transformers) or "onnx" (ONNX Runtime, see dark_pattern_onnx.py)
+DARK_PATTERN_BACKEND = os.getenv("DARK_PATTERN_BACKEND", "torch").lower()
+# Pinned local copy of the weights (see `python dark_pattern.py download`); loaded offline when set
+DARK_PATTERN_MODEL_DIR = os.getenv("DARK_PATTERN_MODEL_DIR", "")
+# Per-worker torch thread pools; 0 keeps torch's default (one per core), which oversubscribes with N workers
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))
+TORCH_NUM_INTEROP_THREADS = int(os.getenv("TORCH_NUM_INTEROP_THREADS", "0"))
+# Opt-in: loading the weights at startup slows every worker start and needs them on disk or the hub
+DARK_PATTERN_WARMUP = os.getenv("DARK_PATTERN_WARMUP", "false").lower() == "true"
+WARMUP_BATCH_SIZE = int(os.getenv("DARK_PATTERN_WARMUP_BATCH_SIZE", "2"))
 
 PRO_PLAN_PRICE_ID = os.getenv("STRIPE_PRO_PLAN_PRICE_ID", "price_123")
 PRO_PLAN_SCANS_PER_MONTH = 10000
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_123")
 
+def probabilities_to_labels(probs) -> Dict[str, float]:
+    """Map the model's class probabilities for one image to our labels."""
+    import numpy as np
+    # For stub, map to our labels (simulate probabilities)
+    # In real use, fine-tune model and map outputs
+    # Here, just return random probabilities for demo
+    np.random.seed(42)
+    fake_probs = np.random.dirichlet(np.ones(len(LABELS)), size=1)[0]
+    return {label: float(p) for label, p in zip(LABELS, fake_probs)}
+
+def model_source() -> Tuple[str, dict]:
+    """Where to load weights from: the pinned local directory (offline) or the hub."""
+    if DARK_PATTERN_MODEL_DIR:
+        # Never reach the Hugging Face hub at runtime once weights are pinned. Passed to
+        # from_pretrained: HF_HUB_OFFLINE is read when transformers is imported, too late here.
+        return DARK_PATTERN_MODEL_DIR, {"local_files_only": True}
+    return MODEL_NAME, {}
+
+def configure_torch_threads():
+    """Apply TORCH_NUM_THREADS / TORCH_NUM_INTEROP_THREADS before the first forward pass."""
+    import torch
+    if TORCH_NUM_THREADS > 0:
+        torch.set_num_threads(TORCH_NUM_THREADS)
+    if TORCH_NUM_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(TORCH_NUM_INTEROP_THREADS)
+        except RuntimeError:
+            # Only settable before inter-op work has started in this process
+            logger.warning("torch inter-op threads already initialised; TORCH_NUM_INTEROP_THREADS ignored")
+
 class DarkPatternClassifier:
     def __init__(self):
-        self.processor = ViTImageProcessor.from_pretrained(MODEL_NAME)
-        self.model = ViTForImageClassification.from_pretrained(MODEL_NAME)
+        from transformers import ViTImageProcessor, ViTForImageClassification
+        configure_torch_threads()
+        source, options = model_source()
+        self.processor = ViTImageProcessor.from_pretrained(source, **options)
+        self.model = ViTForImageClassification.from_pretrained(source, **options)
         self.model.eval()  # type: ignore
 
-    def classify(self, img: Image.Image) -> Dict[str, float]:
-        inputs = self.processor(images=img, return_tensors="pt")  # type: ignore
+    def classify(self, img: "Image.Image") -> Dict[str, float]:
+        return self.classify_batch([img])[0]
+
+    def classify_batch(self, imgs: List["Image.Image"]) -> List[Dict[str, float]]:
+        """One forward pass over all `imgs`; returns label probabilities per image."""
+        return [probabilities_to_labels(p) for p in self.predict_proba(imgs)]
+
+    def predict_logits(self, imgs: List["Image.Image"]):
+        """Raw model outputs, one row per image (numpy array)."""
+        import torch
+        inputs = self.processor(images=[img.convert("RGB") for img in imgs], return_tensors="pt")  # type: ignore
         with torch.no_grad():
-            outputs = self.model(**inputs)  # type: ignore
-            logits = outputs.logits
-            probs = torch.softmax(logits, dim=1).cpu().numpy()[0]
-        # For stub, map to our labels (simulate probabilities)
-        # In real use, fine-tune model and map outputs
-        # Here, just return random probabilities for demo
-        np.random.seed(42)
-        fake_probs = np.random.dirichlet(np.ones(len(LABELS)), size=1)[0]
-        return {label: float(p) for label, p in zip(LABELS, fake_probs)}
+            return self.model(**inputs).logits.cpu().numpy()  # type: ignore
+
+    def predict_proba(self, imgs: List["Image.Image"]):
+        """Softmax over the model's classes, one row per image (numpy array)."""
+        import torch
+        return torch.softmax(torch.from_numpy(self.predict_logits(imgs)), dim=1).numpy()
 
 # Singleton for reuse
 _classifier = None
 
-def classify(img: Image.Image) -> Dict[str, float]:
+def create_classifier(backend: str = DARK_PATTERN_BACKEND):
+    if backend == "torch":
+        return DarkPatternClassifier()
+    if backend == "onnx":
+        from dark_pattern_onnx import OnnxDarkPatternClassifier
+        return OnnxDarkPatternClassifier()
+    raise ValueError(f"Unknown DARK_PATTERN_BACKEND '{backend}' (expected 'torch' or 'onnx')")
+
+def get_classifier():
     global _classifier
     if _classifier is None:
-        _classifier = DarkPatternClassifier()
-    return _classifier.classify(img) 
\ No newline at end of file
+        _classifier = create_classifier()
+    return _classifier
+
+def classify(img: "Image.Image") -> Dict[str, float]:
+    return classify_batch([img])[0]
+
+def classify_batch(imgs: List["Image.Image"]) -> List[Dict[str, float]]:
+    """
+    Classify on the shared inference server when DARK_PATTERN_SERVER_SOCKET
+    is set and it is reachable, otherwise with the in-process model.
+    """
+    from inference_server import get_client, InferenceServerError
+    client = get_client()
+    if client is not None and client.available:
+        try:
+            return client.classify_batch(imgs)
+        except InferenceServerError as e:
+            logger.warning(f"Falling back to in-process classification: {str(e)}")
+            client.mark_down()
+    return get_classifier().classify_batch(imgs)
+
+# Micro-batcher shared by concurrent scans on the running event loop
+_batcher: Optional["MicroBatcher"] = None
+_batcher_loop = None
+
+def get_batcher() -> "MicroBatcher":
+    global _batcher, _batcher_loop
+    from inference import MicroBatcher
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        if _batcher is not None:
+            _batcher.close()
+        # Looked up per batch so the classifier loads in the worker thread, not on the event loop
+        _batcher = MicroBatcher(lambda imgs: classify_batch(imgs), name="dark_pattern")
+        _batcher_loop = loop
+    return _batcher
+
+async def classify_async(img: "Image.Image") -> Dict[str, float]:
+    """Classify `img` in a batch with other concurrent callers, off the event loop."""
+    return await get_batcher().submit(img)
+
+async def stop_batcher():
+    global _batcher
+    if _batcher is not None:
+        await _batcher.stop()
+        _batcher = None
+
+def warm_up(batch_size: int = WARMUP_BATCH_SIZE) -> Dict[str, float]:
+    """
+    Load the classifier and run a dummy batch so the first scan does not pay
+    for weight loading and first-inference allocation. With the inference
+    server configured, only checks that the server answers.
+    Returns timings in milliseconds.
+    """
+    from PIL import Image
+    from inference_server import get_client, InferenceServerError
+    timings: Dict[str, float] = {}
+    dummy = [Image.new("RGB", (1280, 720), (255, 255, 255)) for _ in range(batch_size)]
+    client = get_client()
+    if client is not None:
+        try:
+            start = time.perf_counter()
+            client.classify_batch(dummy)
+            timings["server_ms"] = (time.perf_counter() - start) * 1000
+            logger.info(f"Dark-pattern inference server warmed up: {timings}")
+            return timings
+        except InferenceServerError as e:
+            logger.warning(f"Inference server not ready, warming up in-process model: {str(e)}")
+            client.mark_down()
+    start = time.perf_counter()
+    classifier = get_classifier()
+    timings["load_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    classifier.classify_batch(dummy)
+    timings["first_batch_ms"] = (time.perf_counter() - start) * 1000
+    logger.info(f"Dark-pattern classifier warmed up: {timings}")
+    return timings
+
+def download_weights(target_dir: str):
+    """Save the processor and model weights to `target_dir` for DARK_PATTERN_MODEL_DIR."""
+    from transformers import ViTImageProcessor, ViTForImageClassification
+    ViTImageProcessor.from_pretrained(MODEL_NAME).save_pretrained(target_dir)
+    ViTForImageClassification.from_pretrained(MODEL_NAME).save_pretrained(target_dir)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "download":
+        print("Usage: python dark_pattern.py download <target dir>")
+        sys.exit(1)
+    download_weights(sys.argv[2])
@@ -0,0 +1,87 @@
+"""
+Latency and memory comparison of the dark-pattern classifier backends.
+
+Each backend runs in its own process so its resident memory is measured in
+isolation. Reports model load time, per-image latency at batch size 1 and
+per-image latency at BATCH_SIZE, and peak RSS.
+
+Usage: python dark_pattern_benchmark.py [torch] [onnx] [onnx-fp32]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from statistics import median
+from typing import Dict, List
+
+BACKENDS = {
+    "torch": {"DARK_PATTERN_BACKEND": "torch"},
+    "onnx": {"DARK_PATTERN_BACKEND": "onnx", "DARK_PATTERN_ONNX_QUANTIZE": "true"},
+    "onnx-fp32": {"DARK_PATTERN_BACKEND": "onnx", "DARK_PATTERN_ONNX_QUANTIZE": "false"},
+}
+RUNS = 20
+BATCH_SIZE = 8
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_worker() -> Dict[str, float]:
+    from PIL import Image
+    from dark_pattern import create_classifier
+    img = Image.new("RGB", (1280, 800), (240, 240, 240))
+    baseline_mb = peak_rss_mb()
+    start = time.perf_counter()
+    classifier = create_classifier()
+    load_ms = (time.perf_counter() - start) * 1000
+    classifier.classify(img)  # warm-up
+    single: List[float] = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        classifier.classify(img)
+        single.append((time.perf_counter() - start) * 1000)
+    batched: List[float] = []
+    for _ in range(max(1, RUNS // BATCH_SIZE)):
+        start = time.perf_counter()
+        classifier.classify_batch([img] * BATCH_SIZE)
+        batched.append((time.perf_counter() - start) * 1000 / BATCH_SIZE)
+    return {
+        "load_ms": load_ms,
+        "p50_ms": median(single),
+        "p95_ms": sorted(single)[int(len(single) * 0.95) - 1],
+        "batched_ms_per_image": median(batched),
+        "model_rss_mb": peak_rss_mb() - baseline_mb,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_backend(name: str) -> Dict[str, float]:
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=dict(os.environ, **BACKENDS[name]),
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} backend failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main(names: List[str]) -> int:
+    print(f"{'backend':<10} {'load ms':>9} {'p50 ms':>8} {'p95 ms':>8} {f'b{BATCH_SIZE} ms/img':>11} {'model MB':>9} {'peak MB':>8}")
+    failed = False
+    for name in names or list(BACKENDS):
+        try:
+            r = run_backend(name)
+        except RuntimeError as e:
+            print(f"{name:<10} ❌ {e}")
+            failed = True
+            continue
+        print(f"{name:<10} {r['load_ms']:>9.0f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['batched_ms_per_image']:>11.1f} {r['model_rss_mb']:>9.0f} {r['peak_rss_mb']:>8.0f}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--worker"]:
+        print(json.dumps(run_worker()))
+        sys.exit(0)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,131 @@
+"""
+ONNX Runtime backend for the dark-pattern classifier (DARK_PATTERN_BACKEND=onnx).
+
+The ViT model is exported to ONNX once, optionally quantized to int8 with
+dynamic quantization, and served by ONNX Runtime on CPU. Only the export
+needs torch; serving needs onnxruntime, numpy and the transformers image
+processor. Workers never export: the model must be built ahead of time
+(e.g. while building the image), or the backend fails to load.
+    python dark_pattern_onnx.py export
+"""
+import os
+import sys
+import tempfile
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from dark_pattern import model_source, probabilities_to_labels
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+ONNX_MODEL_DIR = os.path.expanduser(os.getenv("DARK_PATTERN_ONNX_DIR", "~/.cache/regulaai/onnx"))
+ONNX_QUANTIZE = os.getenv("DARK_PATTERN_ONNX_QUANTIZE", "true").lower() == "true"
+# 0 lets ONNX Runtime use one thread per physical core
+ONNX_INTRA_OP_THREADS = int(os.getenv("DARK_PATTERN_ONNX_THREADS", "0"))
+ONNX_OPSET = 14
+
+def model_path(quantize: bool = ONNX_QUANTIZE, model_dir: str = ONNX_MODEL_DIR) -> str:
+    return os.path.join(model_dir, "vit.int8.onnx" if quantize else "vit.onnx")
+
+def export_onnx(output_path: str, model=None) -> str:
+    """Export the torch ViT (or `model`) to an fp32 ONNX graph with a dynamic batch axis."""
+    import torch
+    if model is None:
+        from transformers import ViTForImageClassification
+        source, options = model_source()
+        model = ViTForImageClassification.from_pretrained(source, **options)
+        model.eval()
+
+    class LogitsOnly(torch.nn.Module):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def forward(self, pixel_values):
+            return self.inner(pixel_values=pixel_values).logits
+
+    tmp_path = _temp_path(output_path)
+    with torch.no_grad():
+        torch.onnx.export(
+            LogitsOnly(model),
+            (torch.zeros(1, 3, 224, 224),),
+            tmp_path,
+            input_names=["pixel_values"],
+            output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=ONNX_OPSET,
+        )
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def quantize_onnx(input_path: str, output_path: str) -> str:
+    """Dynamic int8 quantization of the weights of an fp32 ONNX graph."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    tmp_path = _temp_path(output_path)
+    quantize_dynamic(input_path, tmp_path, weight_type=QuantType.QInt8)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def _temp_path(output_path: str) -> str:
+    # Unique per writer, so concurrent builds never write to the same file before the rename
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".onnx", dir=os.path.dirname(output_path) or ".")
+    os.close(fd)
+    return tmp_path
+
+def build_model(quantize: bool = ONNX_QUANTIZE, model_dir: str = ONNX_MODEL_DIR, model=None) -> str:
+    """Build step: export (and quantize) the ONNX model unless it is already on disk. Needs torch."""
+    fp32_path = model_path(False, model_dir)
+    target = model_path(quantize, model_dir)
+    if os.path.exists(target):
+        return target
+    if not os.path.exists(fp32_path):
+        export_onnx(fp32_path, model)
+    if quantize:
+        quantize_onnx(fp32_path, target)
+    return target
+
+class OnnxDarkPatternClassifier:
+    """Same contract as DarkPatternClassifier, served by ONNX Runtime."""
+
+    def __init__(self, path: Optional[str] = None, quantize: bool = ONNX_QUANTIZE, intra_op_threads: int = ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+        from transformers import ViTImageProcessor
+        source, options = model_source()
+        self.processor = ViTImageProcessor.from_pretrained(source, **options)
+        self.path = path or model_path(quantize)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"ONNX model not found at {self.path}; build it with `python dark_pattern_onnx.py export`")
+        session_options = ort.SessionOptions()
+        session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.intra_op_num_threads = intra_op_threads
+        # Batches run one at a time (see inference.py), so parallelism is within ops only
+        session_options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.path, session_options, providers=["CPUExecutionProvider"])
+
+    def classify(self, img: "Image.Image") -> Dict[str, float]:
+        return self.classify_batch([img])[0]
+
+    def classify_batch(self, imgs: List["Image.Image"]) -> List[Dict[str, float]]:
+        return [probabilities_to_labels(p) for p in self.predict_proba(imgs)]
+
+    def predict_logits(self, imgs: List["Image.Image"]):
+        """Raw model outputs, one row per image (numpy array)."""
+        import numpy as np
+        inputs = self.processor(images=[img.convert("RGB") for img in imgs], return_tensors="np")  # type: ignore
+        return self.session.run(["logits"], {"pixel_values": inputs["pixel_values"].astype(np.float32)})[0]
+
+    def predict_proba(self, imgs: List["Image.Image"]):
+        """Softmax over the model's classes, one row per image (numpy array)."""
+        import numpy as np
+        logits = self.predict_logits(imgs)
+        logits = logits - logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["export"]:
+        print(__doc__)
+        sys.exit(1)
+    print(build_model(quantize=False))
+    print(build_model(quantize=True))
@@ -0,0 +1,183 @@
+import ipaddress
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_SUFFIX_LIST_PATH = os.getenv("PUBLIC_SUFFIX_LIST_PATH", os.path.join(DATA_DIR, "public_suffix_list.dat"))
+TRACKER_LIST_PATH = os.getenv("TRACKER_LIST_PATH", os.path.join(DATA_DIR, "trackers.json"))
+TRACKER_CATEGORIES = ("analytics", "advertising", "social", "cdn")
+# Distinct hosts remembered by the per-host lookup caches
+DOMAIN_CACHE_SIZE = 65536
+
+# Node keys that cannot collide with a DNS label
+_VALUE = "$"
+_EXCEPTION = "!"
+
+
+class DomainTrie:
+    """
+    Domains stored by reversed labels ("static.example.com" is found under
+    com -> example -> static), so a lookup costs one dict access per label
+    of the host being matched, however many domains are stored.
+    """
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def insert(self, domain: str, value: Any = True):
+        node = self.root
+        for label in reversed(domain.split(".")):
+            node = node.setdefault(label, {})
+        node[_VALUE] = value
+
+    def longest_match(self, labels: List[str]) -> Tuple[int, Any]:
+        """
+        For a host split into labels, return (number of trailing labels, value)
+        of the longest stored domain the host equals or is a subdomain of,
+        or (0, None) when nothing matches.
+        """
+        node = self.root
+        depth, value = 0, None
+        for i, label in enumerate(reversed(labels)):
+            node = node.get(label)
+            if node is None:
+                break
+            if _VALUE in node:
+                depth, value = i + 1, node[_VALUE]
+        return depth, value
+
+
+class PublicSuffixList:
+    """
+    Public suffix list (ICANN and private sections) compiled into a
+    reversed-label trie, including wildcard (*.ck) and exception (!www.ck)
+    rules.
+    """
+
+    def __init__(self, rules: List[str]):
+        self._trie = DomainTrie()
+        for rule in rules:
+            exception = rule.startswith("!")
+            if exception:
+                rule = rule[1:]
+            node = self._trie.root
+            for label in reversed(_to_ascii(rule).split(".")):
+                node = node.setdefault(label, {})
+            node[_EXCEPTION if exception else _VALUE] = True
+
+    @classmethod
+    def from_file(cls, path: str = PUBLIC_SUFFIX_LIST_PATH) -> "PublicSuffixList":
+        rules = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("//"):
+                    rules.append(line.split()[0])
+        return cls(rules)
+
+    def suffix_length(self, labels: List[str]) -> int:
+        """Number of trailing labels of the host that form its public suffix."""
+        node = self._trie.root
+        # Implicit "*" rule: an unlisted TLD is a public suffix
+        length = 1
+        for i, label in enumerate(reversed(labels)):
+            child = node.get(label)
+            if child is not None and _EXCEPTION in child:
+                # Exception rules mark this label as registrable under the parent suffix
+                return i
+            wildcard = node.get("*")
+            if (child is not None and _VALUE in child) or (wildcard is not None and _VALUE in wildcard):
+                length = i + 1
+            node = child if child is not None else wildcard
+            if node is None:
+                break
+        return length
+
+    def public_suffix(self, host: str) -> str:
+        labels = host.split(".")
+        return ".".join(labels[-self.suffix_length(labels):])
+
+    def registrable_domain(self, host: str) -> Optional[str]:
+        """eTLD+1 of `host`, or None when the host is itself a public suffix."""
+        labels = host.split(".")
+        length = self.suffix_length(labels)
+        if len(labels) <= length:
+            return None
+        return ".".join(labels[-(length + 1):])
+
+
+class TrackerIndex:
+    """Tracker and ad-tech domains with their category and owning company."""
+
+    def __init__(self, domains: Dict[str, Dict[str, str]]):
+        self._trie = DomainTrie()
+        for domain, info in domains.items():
+            category = info.get("category")
+            if category not in TRACKER_CATEGORIES:
+                raise ValueError(f"Unknown tracker category '{category}' for {domain}")
+            self._trie.insert(_to_ascii(domain), {"domain": domain, **info})
+
+    @classmethod
+    def from_file(cls, path: str = TRACKER_LIST_PATH) -> "TrackerIndex":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["domains"])
+
+    def match(self, host: str) -> Optional[Dict[str, str]]:
+        """Entry for the most specific listed domain `host` belongs to."""
+        return self._trie.longest_match(host.split("."))[1]
+
+
+def _to_ascii(domain: str) -> str:
+    domain = domain.lower()
+    if domain.isascii():
+        return domain
+    try:
+        return domain.encode("idna").decode("ascii")
+    except UnicodeError:
+        return domain
+
+
+def normalize_host(host: str) -> str:
+    """Lower-cased host without port, brackets or trailing dot."""
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host[1:].split("]")[0]
+    if host.count(":") == 1:
+        host = host.split(":")[0]
+    return host.rstrip(".")
+
+
+@lru_cache(maxsize=1)
+def get_public_suffix_list() -> PublicSuffixList:
+    return PublicSuffixList.from_file()
+
+
+@lru_cache(maxsize=1)
+def get_tracker_index() -> TrackerIndex:
+    return TrackerIndex.from_file()
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def site_of_host(host: str) -> str:
+    """
+    Site a host belongs to: its registrable domain, or the host itself for
+    IP addresses, single-label hosts and bare public suffixes.
+    """
+    host = normalize_host(host)
+    try:
+        ipaddress.ip_address(host)
+        return host
+    except ValueError:
+        pass
+    return get_public_suffix_list().registrable_domain(host) or host
+
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def tracker_for_host(host: str) -> Optional[Dict[str, str]]:
+    return get_tracker_index().match(normalize_host(host))
+
+
+def is_third_party(host: str, first_party_site: str) -> bool:
+    return bool(host) and site_of_host(host) != first_party_site
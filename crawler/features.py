@@ -0,0 +1,87 @@
+"""
+Indexed view of a scan result for rule evaluation.
+
+Built once per scan result (see rule_engine.evaluate_rules) so that rules
+asking "is cookie X set", "does the page load domain Y" or "is script Z
+present" are dict lookups instead of scans over the raw lists. Every index
+is a plain dict so JMESPath can address it (`features.cookie_names."_ga"`)
+and restricted Python tests can test membership (`'_ga' in features.cookie_names`).
+
+The view is shared by every rule of an evaluation and must not be modified.
+"""
+from typing import Any, Dict, Iterable
+
+from domains import site_of_host
+
+
+def _host(url: str) -> str:
+    # urlsplit is the bulk of the build time on pages with thousands of requests;
+    # the host is all that is needed
+    _, sep, rest = url.partition("://")
+    if not sep:
+        return ""
+    netloc = rest.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0].rpartition("@")[2]
+    if netloc.startswith("["):
+        return netloc[1:netloc.find("]")].lower()
+    return netloc.split(":", 1)[0].lower()
+
+
+def _count(keys: Iterable[str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for key in keys:
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _parents(hosts: Iterable[str]) -> Dict[str, bool]:
+    """Each host and every parent domain of it, so "under domain D" is one lookup."""
+    parents: Dict[str, bool] = {}
+    for host in hosts:
+        labels = host.split(".")
+        for i in range(len(labels)):
+            parents[".".join(labels[i:])] = True
+    return parents
+
+
+def build_features(result: dict) -> Dict[str, Any]:
+    cookies = result.get("cookies") or []
+    requests = result.get("network_requests") or []
+    third_party = [h.lower() for h in result.get("third_party_domains") or [] if isinstance(h, str)]
+    scripts = result.get("script_hashes") or []
+
+    # Rules may be evaluated on partial or hand-written results; only well-formed entries are indexed
+    cookie_dicts = [c for c in cookies if isinstance(c, dict)]
+    script_dicts = [s for s in scripts if isinstance(s, dict)]
+    cookie_names = {str(c.get("name", "")).lower(): True for c in cookie_dicts if c.get("name")}
+    # network_requests holds URLs; request dicts with a "url" are accepted as well
+    request_hosts = _count(_host(r if isinstance(r, str) else str(r.get("url", ""))) for r in requests if isinstance(r, (str, dict)))
+    script_urls = [str(s.get("script_url", "")).lower() for s in script_dicts]
+    script_hosts = _count(_host(url) for url in script_urls)
+    registrable_domains: Dict[str, int] = {}
+    for host, n in request_hosts.items():
+        site = site_of_host(host)
+        registrable_domains[site] = registrable_domains.get(site, 0) + n
+    robots = result.get("robots_meta") or ""
+    return {
+        "cookie_names": cookie_names,
+        "cookie_domains": _count(str(c.get("domain", "")).lstrip(".").lower() for c in cookie_dicts),
+        "request_hosts": request_hosts,
+        "registrable_domains": registrable_domains,
+        "third_party_hosts": {host: True for host in third_party},
+        "third_party_sites": {site_of_host(host): True for host in third_party},
+        "third_party_parents": _parents(third_party),
+        "script_hashes": {s["sha256"]: s.get("script_url") for s in script_dicts if s.get("sha256")},
+        "script_hosts": script_hosts,
+        "script_parents": _parents(script_hosts),
+        "script_urls": script_urls,
+        "robots_directives": {d.strip().lower(): True for d in robots.split(",") if d.strip()},
+        "counts": {
+            "cookies": len(cookies),
+            "requests": len(requests),
+            "request_hosts": len(request_hosts),
+            "third_party_hosts": len(third_party),
+            "scripts": len(scripts),
+            "trackers": len(result.get("trackers") or []),
+        },
+    }
@@ -0,0 +1,86 @@
+"""
+Import-time benchmark based on `python -X importtime`.
+
+Fails (exit code 1) when a module takes longer than its budget to import,
+or when importing it pulls in one of the heavy modules that must only load
+on first use (the ML stack, PIL).
+
+Usage: python import_benchmark.py [module ...]
+"""
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Cumulative import time budgets in milliseconds
+IMPORT_BUDGETS_MS = {
+    "scan": 600,
+    "lambda_handler": 700,
+    "dark_pattern": 50,
+    "rule_engine": 150,
+    "app": 2500,
+}
+# Modules that must never be imported at startup
+DEFERRED_MODULES = ("torch", "transformers", "PIL")
+RUNS = 3
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """Return the cumulative import time (ms) of `module` and every module it imported."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, env=env
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+    cumulative_us = 0
+    imported = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        imported.append(name.strip())
+        # Top-level entries (no indentation) are the modules imported directly by `-c`
+        if name.rstrip() == f" {module}":
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, imported
+
+def check_module(module: str, budget_ms: Optional[float] = None, runs: int = RUNS, enforce_budget: bool = True) -> List[str]:
+    """
+    Return a list of problems found for `module` (empty when within budget).
+    With `enforce_budget=False` only deferred-module imports are reported.
+    """
+    budget_ms = IMPORT_BUDGETS_MS.get(module) if budget_ms is None else budget_ms
+    best_ms = None
+    imported: List[str] = []
+    for _ in range(runs):
+        elapsed_ms, imported = measure_import(module)
+        best_ms = elapsed_ms if best_ms is None else min(best_ms, elapsed_ms)
+    problems = []
+    heavy = sorted({name.split(".")[0] for name in imported} & set(DEFERRED_MODULES))
+    if heavy:
+        problems.append(f"{module} imports {', '.join(heavy)} at startup")
+    if enforce_budget and budget_ms is not None and best_ms is not None and best_ms > budget_ms:
+        problems.append(f"{module} imports in {best_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    print(f"{module}: {best_ms:.0f} ms (budget {budget_ms if budget_ms is not None else '-'} ms)")
+    return problems
+
+def main(modules: List[str]) -> int:
+    results: Dict[str, List[str]] = {}
+    for module in modules or list(IMPORT_BUDGETS_MS):
+        try:
+            results[module] = check_module(module)
+        except RuntimeError as e:
+            results[module] = [str(e)]
+    problems = [p for found in results.values() for p in found]
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ All imports within budget")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from prometheus_client import Histogram
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+INFERENCE_MAX_WAIT_MS = int(os.getenv("INFERENCE_MAX_WAIT_MS", "20"))
+# Requests allowed to queue before callers wait for room
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "256"))
+
+# Prometheus metrics
+inference_batch_size = Histogram(
+    'inference_batch_size', 'Inputs per inference batch', ['model'],
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+inference_queue_wait_seconds = Histogram(
+    'inference_queue_wait_seconds', 'Time an input waited before its batch started', ['model'],
+    buckets=(0.001, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+inference_batch_seconds = Histogram(
+    'inference_batch_seconds', 'Time to run one inference batch', ['model'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+
+class MicroBatcher:
+    """
+    Collects concurrent `submit()` calls into batches of up to
+    `max_batch_size` inputs, waiting at most `max_wait_ms` after the first
+    input for the batch to fill, and runs `batch_fn` on each batch in a
+    dedicated worker thread so the event loop never blocks on inference.
+    `batch_fn` takes a list of inputs and returns one result per input.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        name: str,
+        max_batch_size: int = INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms: int = INFERENCE_MAX_WAIT_MS,
+        max_queue: int = INFERENCE_MAX_QUEUE,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive")
+        self.batch_fn = batch_fn
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: "asyncio.Queue[Optional[Tuple[Any, asyncio.Future, float]]]" = asyncio.Queue(maxsize=max_queue)
+        # One thread: batches run back to back and the model is never used concurrently
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{name}-inference")
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        """Finish queued work, then stop the collector and worker thread."""
+        if self._task is not None:
+            await self._queue.put(None)
+            await self._task
+            self._task = None
+        self._executor.shutdown(wait=True)
+
+    def close(self):
+        """Release the worker thread without waiting, e.g. once the batcher's event loop is gone."""
+        self._executor.shutdown(wait=False)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    entry = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            await self._run_batch(loop, batch)
+
+    async def _run_batch(self, loop: asyncio.AbstractEventLoop, batch: List[Tuple[Any, asyncio.Future, float]]):
+        # Callers that gave up (e.g. a cancelled scan) are not worth a forward pass
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        for _, _, queued_at in batch:
+            inference_queue_wait_seconds.labels(model=self.name).observe(started - queued_at)
+        inference_batch_size.labels(model=self.name).observe(len(batch))
+        try:
+            results = await loop.run_in_executor(self._executor, self.batch_fn, [item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for a batch of {len(batch)}")
+        except Exception as e:
+            logger.error(f"{self.name} inference batch of {len(batch)} failed: {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            inference_batch_seconds.labels(model=self.name).observe(time.perf_counter() - started)
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,227 @@
+"""
+Local model-serving sidecar for the dark-pattern classifier.
+
+One process per node owns the model; API workers send screenshots over a
+Unix socket and get label probabilities back, so memory scales with one
+model instead of one per worker. Pixels travel through POSIX shared memory:
+the client writes RGB bytes into a segment and sends only its name and the
+image sizes, and the server wraps the segment without copying.
+
+Requests from all workers go through one micro-batcher (see inference.py).
+
+Usage: python inference_server.py [socket path]
+Workers opt in with DARK_PATTERN_SERVER_SOCKET=<socket path>.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+DARK_PATTERN_SERVER_SOCKET = os.getenv("DARK_PATTERN_SERVER_SOCKET", "")
+DARK_PATTERN_SERVER_TIMEOUT_MS = int(os.getenv("DARK_PATTERN_SERVER_TIMEOUT_MS", "30000"))
+# After a failed call, workers use in-process inference for this long before trying the server again
+DARK_PATTERN_SERVER_RETRY_S = int(os.getenv("DARK_PATTERN_SERVER_RETRY_S", "30"))
+DEFAULT_SOCKET_PATH = "/tmp/regulaai-inference.sock"
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+class InferenceServerError(Exception):
+    """Raised when the sidecar cannot be reached or reports a failure."""
+
+
+def _send_message(sock: socket.socket, message: dict):
+    body = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise InferenceServerError("Inference server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv_message(sock: socket.socket) -> dict:
+    (size,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise InferenceServerError(f"Inference server reply of {size} bytes is too large")
+    return json.loads(_recv_exactly(sock, size))
+
+
+class InferenceClient:
+    """
+    Blocking client used from the classifier's worker thread. Keeps one
+    connection open and reconnects once if it went stale.
+    """
+
+    def __init__(self, socket_path: str, timeout_ms: int = DARK_PATTERN_SERVER_TIMEOUT_MS):
+        self.socket_path = socket_path
+        self.timeout_s = timeout_ms / 1000
+        self._sock: Optional[socket.socket] = None
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def classify_batch(self, imgs: List["Image.Image"]) -> List[Dict[str, float]]:
+        rgb = [img.convert("RGB") for img in imgs]
+        sizes = [img.width * img.height * 3 for img in rgb]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(sizes)))
+        try:
+            images = []
+            offset = 0
+            for img, size in zip(rgb, sizes):
+                shm.buf[offset:offset + size] = img.tobytes()
+                images.append({"width": img.width, "height": img.height, "offset": offset})
+                offset += size
+            reply = self._call({"shm": shm.name, "images": images})
+        finally:
+            shm.close()
+            shm.unlink()
+        if "error" in reply:
+            raise InferenceServerError(reply["error"])
+        results = reply["results"]
+        if len(results) != len(imgs):
+            raise InferenceServerError(f"Inference server returned {len(results)} results for {len(imgs)} images")
+        return results
+
+    def ping(self) -> dict:
+        return self._call({"ping": True})
+
+    def mark_down(self):
+        self._down_until = time.monotonic() + DARK_PATTERN_SERVER_RETRY_S
+
+    def _call(self, message: dict) -> dict:
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self._sock.settimeout(self.timeout_s)
+                        self._sock.connect(self.socket_path)
+                    _send_message(self._sock, message)
+                    return _recv_message(self._sock)
+                except (OSError, InferenceServerError) as e:
+                    self.close()
+                    # A connection the server already closed fails on first use; retry once on a new one
+                    if attempt == 1 or isinstance(e, (FileNotFoundError, ConnectionRefusedError, socket.timeout)):
+                        raise InferenceServerError(f"Inference server at {self.socket_path} unavailable: {e}") from e
+        raise AssertionError("unreachable")
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+
+_client: Optional[InferenceClient] = None
+
+
+def get_client() -> Optional[InferenceClient]:
+    """Client for the configured sidecar, or None when DARK_PATTERN_SERVER_SOCKET is unset."""
+    global _client
+    if not DARK_PATTERN_SERVER_SOCKET:
+        return None
+    if _client is None:
+        _client = InferenceClient(DARK_PATTERN_SERVER_SOCKET)
+    return _client
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name=name)
+    # The client owns (and unlinks) the segment; stop this process's tracker from also cleaning it up
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, batcher):
+    from PIL import Image
+    from dark_pattern import MODEL_NAME, DARK_PATTERN_BACKEND
+    try:
+        while True:
+            try:
+                (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                request = json.loads(await reader.readexactly(size))
+            except asyncio.IncompleteReadError:
+                break
+            if request.get("ping"):
+                reply = {"ok": True, "model": MODEL_NAME, "backend": DARK_PATTERN_BACKEND}
+            else:
+                shm = None
+                try:
+                    shm = _attach(request["shm"])
+                    imgs = [
+                        Image.frombuffer("RGB", (i["width"], i["height"]), shm.buf[i["offset"]:i["offset"] + i["width"] * i["height"] * 3], "raw", "RGB", 0, 1)
+                        for i in request["images"]
+                    ]
+                    results = await asyncio.gather(*(batcher.submit(img) for img in imgs))
+                    # Release the views into the segment before closing it
+                    del imgs
+                    reply = {"results": results}
+                except Exception as e:
+                    logger.error(f"Inference request failed: {str(e)}")
+                    reply = {"error": str(e)}
+                finally:
+                    if shm is not None:
+                        try:
+                            shm.close()
+                        except BufferError:
+                            pass
+            body = json.dumps(reply).encode("utf-8")
+            writer.write(HEADER.pack(len(body)) + body)
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def serve(socket_path: str, classifier=None, ready: Optional[asyncio.Event] = None):
+    from dark_pattern import get_classifier
+    from inference import MicroBatcher
+    if classifier is None:
+        # Load the model before accepting connections so the first request is not slow
+        classifier = await asyncio.to_thread(get_classifier)
+    batcher = MicroBatcher(classifier.classify_batch, name="dark_pattern_server")
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = await asyncio.start_unix_server(lambda r, w: handle_connection(r, w, batcher), path=socket_path)
+    os.chmod(socket_path, 0o660)
+    logger.info(f"Inference server listening on {socket_path}")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    path = sys.argv[1] if len(sys.argv) > 1 else (DARK_PATTERN_SERVER_SOCKET or DEFAULT_SOCKET_PATH)
+    try:
+        asyncio.run(serve(path))
+    except KeyboardInterrupt:
+        pass
@@ -1,12 +1,22 @@
 import json
 import asyncio
+import logging
+import os
 from scan import run_scan
+from dark_pattern import warm_up, DARK_PATTERN_WARMUP
 try:
     from playwright_aws_lambda import chromium  # type: ignore[import]
 except ImportError:
     chromium = None  # type: ignore
     from playwright.async_api import async_playwright
 
+# Load the model during the Lambda init phase rather than in the first invocation
+if os.getenv("AWS_LAMBDA_FUNCTION_NAME") and DARK_PATTERN_WARMUP:
+    try:
+        warm_up()
+    except Exception as e:
+        logging.warning(f"Dark-pattern model warm-up failed: {str(e)}")
+
 async def get_context():
     if chromium is not None:
         return chromium.launch_persistent_context('/tmp/playwright', headless=True)
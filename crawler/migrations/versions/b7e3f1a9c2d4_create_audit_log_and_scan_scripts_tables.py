@@ -0,0 +1,52 @@
+"""Create audit_log and scan_scripts tables
+
+Revision ID: b7e3f1a9c2d4
+Revises: 5198620ac08e
+Create Date: 2026-10-17 09:12:03.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f1a9c2d4'
+down_revision: Union[str, None] = '5198620ac08e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # These tables used to be created by metadata.create_all() at import time,
+    # so existing databases may already have them.
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    if 'audit_log' not in existing:
+        op.create_table(
+            'audit_log',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+            sa.Column('ip', sa.String(length=64), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('action', sa.String(length=128), nullable=False),
+            sa.Column('meta', sa.JSON(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'scan_scripts' not in existing:
+        op.create_table(
+            'scan_scripts',
+            sa.Column('scan_id', sa.String(), nullable=False),
+            sa.Column('domain', sa.String(), nullable=False),
+            sa.Column('script_url', sa.String(), nullable=False),
+            sa.Column('sha256', sa.String(), nullable=False),
+            sa.Column('response_size', sa.Integer(), nullable=False)
+        )
+    indexes = [ix['name'] for ix in sa.inspect(op.get_bind()).get_indexes('scan_scripts')]
+    if 'ix_scan_scripts_domain' not in indexes:
+        op.create_index('ix_scan_scripts_domain', 'scan_scripts', ['domain'])
+
+
+def downgrade() -> None:
+    # The tables may predate this revision, so only the index is dropped
+    op.drop_index('ix_scan_scripts_domain', table_name='scan_scripts')
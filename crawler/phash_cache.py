@@ -0,0 +1,210 @@
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+from prometheus_client import Counter, Gauge
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Opt-in: a 64-bit dHash cannot tell apart banners that differ only in their
+# buttons or wording, so same-layout pages can share a classification
+PHASH_CACHE_ENABLED = os.getenv("PHASH_CACHE_ENABLED", "false").lower() == "true"
+# Screenshots within this many differing bits of a cached one reuse its classification
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "0"))
+PHASH_CACHE_MAX_ENTRIES = int(os.getenv("PHASH_CACHE_MAX_ENTRIES", "50000"))
+# Optional JSON file the cache is loaded from at start and saved to on shutdown
+PHASH_CACHE_PATH = os.getenv("PHASH_CACHE_PATH", "")
+HASH_SIZE = 8
+
+phash_cache_requests_total = Counter('phash_cache_requests_total', 'Perceptual-hash cache lookups by outcome', ['outcome'])
+phash_cache_entries = Gauge('phash_cache_entries', 'Screenshots held by the perceptual-hash cache')
+phash_cache_hit_ratio = Gauge('phash_cache_hit_ratio', 'Share of screenshot classifications served by the perceptual-hash cache')
+
+
+def dhash(img: "Image.Image", hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: downscale to (hash_size + 1) x hash_size grayscale and
+    set one bit per pixel that is brighter than its right neighbour.
+    """
+    from PIL import Image
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes with Hamming distance. A search
+    within distance d only descends into children whose edge distance lies
+    in [dist - d, dist + d], so lookups visit a small part of the tree.
+    """
+
+    def __init__(self):
+        # Node: [hash, children {edge distance: node}]
+        self._root: Optional[list] = None
+        self.size = 0
+
+    def add(self, value: int):
+        if self._root is None:
+            self._root = [value, {}]
+            self.size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = [value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def nearest(self, value: int, max_distance: int) -> Optional[Tuple[int, int]]:
+        """(hash, distance) of the closest stored hash within `max_distance`, or None."""
+        if self._root is None:
+            return None
+        best: Optional[Tuple[int, int]] = None
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance and (best is None or distance < best[1]):
+                best = (node[0], distance)
+                if distance == 0:
+                    break
+            limit = best[1] - 1 if best is not None else max_distance
+            for edge, child in node[1].items():
+                if distance - limit <= edge <= distance + limit:
+                    stack.append(child)
+        return best
+
+
+class PerceptualHashCache:
+    """
+    Classification results keyed by the dHash of a screenshot, matched
+    within `max_distance` bits through a BK-tree. The oldest entries are
+    dropped past `max_entries`; the tree is rebuilt from the survivors since
+    BK-trees do not support removal.
+    """
+
+    def __init__(self, max_distance: int = PHASH_MAX_DISTANCE, max_entries: int = PHASH_CACHE_MAX_ENTRIES, path: str = PHASH_CACHE_PATH, namespace: str = ""):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.path = path
+        # Results from another model are not reused
+        self.namespace = namespace
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+        self._tree = BKTree()
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self.load()
+
+    def get(self, phash: int) -> Optional[Tuple[Any, int]]:
+        """(cached result, Hamming distance) for the nearest match, or None."""
+        match = self._tree.nearest(phash, self.max_distance)
+        if match is None:
+            self.misses += 1
+            phash_cache_requests_total.labels(outcome="miss").inc()
+            phash_cache_hit_ratio.set(self.hit_rate)
+            return None
+        self.hits += 1
+        phash_cache_requests_total.labels(outcome="hit").inc()
+        phash_cache_hit_ratio.set(self.hit_rate)
+        self._entries.move_to_end(match[0])
+        return self._entries[match[0]], match[1]
+
+    def put(self, phash: int, result: Any):
+        if phash in self._entries:
+            self._entries[phash] = result
+            self._entries.move_to_end(phash)
+            return
+        self._entries[phash] = result
+        self._tree.add(phash)
+        if len(self._entries) > self.max_entries:
+            # Drop the oldest tenth at once so rebuilds stay rare
+            for _ in range(max(1, self.max_entries // 10)):
+                self._entries.popitem(last=False)
+            self._rebuild()
+        phash_cache_entries.set(len(self._entries))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 4)}
+
+    def _rebuild(self):
+        self._tree = BKTree()
+        for phash in self._entries:
+            self._tree.add(phash)
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load perceptual-hash cache from {self.path}: {str(e)}")
+            return
+        if data.get("namespace") != self.namespace or data.get("hash_size") != HASH_SIZE:
+            logger.info(f"Ignoring perceptual-hash cache at {self.path} built for another model")
+            return
+        entries: List[list] = data.get("entries", [])
+        for phash_hex, result in entries[-self.max_entries:]:
+            self._entries[int(phash_hex, 16)] = result
+        self._rebuild()
+        phash_cache_entries.set(len(self._entries))
+
+    def save(self):
+        if not self.path:
+            return
+        data = {
+            "namespace": self.namespace,
+            "hash_size": HASH_SIZE,
+            "entries": [[f"{phash:016x}", result] for phash, result in self._entries.items()],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+
+_phash_cache: Optional[PerceptualHashCache] = None
+
+
+def get_phash_cache() -> PerceptualHashCache:
+    global _phash_cache
+    if _phash_cache is None:
+        from dark_pattern import MODEL_NAME, DARK_PATTERN_BACKEND
+        _phash_cache = PerceptualHashCache(namespace=f"{MODEL_NAME}:{DARK_PATTERN_BACKEND}")
+    return _phash_cache
+
+
+def save_phash_cache():
+    if _phash_cache is not None:
+        logger.info(f"Perceptual-hash cache stats: {_phash_cache.stats()}")
+        try:
+            _phash_cache.save()
+        except OSError as e:
+            logger.warning(f"Failed to save perceptual-hash cache: {str(e)}")
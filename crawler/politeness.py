@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import os
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+POLITENESS_HOST_CONCURRENCY = int(os.getenv("POLITENESS_HOST_CONCURRENCY", "2"))
+POLITENESS_MIN_DELAY_MS = int(os.getenv("POLITENESS_MIN_DELAY_MS", "500"))
+POLITENESS_GLOBAL_CONCURRENCY = int(os.getenv("POLITENESS_GLOBAL_CONCURRENCY", "64"))
+POLITENESS_RESPECT_ROBOTS = os.getenv("POLITENESS_RESPECT_ROBOTS", "true").lower() == "true"
+# Upper bound for a robots.txt Crawl-delay, so one site cannot stall a batch
+POLITENESS_MAX_CRAWL_DELAY_S = float(os.getenv("POLITENESS_MAX_CRAWL_DELAY_S", "10"))
+ROBOTS_TTL_SECONDS = int(os.getenv("ROBOTS_TTL_SECONDS", "3600"))
+ROBOTS_CACHE_MAX_ENTRIES = int(os.getenv("ROBOTS_CACHE_MAX_ENTRIES", "10000"))
+ROBOTS_TIMEOUT_MS = int(os.getenv("ROBOTS_TIMEOUT_MS", "5000"))
+ROBOTS_USER_AGENT = os.getenv("ROBOTS_USER_AGENT", "RegulaAI")
+
+# Prometheus metrics
+host_queue_depth = Gauge('politeness_host_queue_depth', 'Scans waiting for a per-host slot', ['host'])
+host_in_flight = Gauge('politeness_host_in_flight', 'Scans currently running against a host', ['host'])
+politeness_delay_seconds = Histogram(
+    'politeness_delay_seconds', 'Time a scan waited for per-host and global slots',
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+robots_fetches_total = Counter('robots_fetches_total', 'robots.txt lookups by outcome', ['outcome'])
+
+
+class RobotsDisallowed(Exception):
+    """Raised when robots.txt does not allow fetching a URL."""
+
+
+def host_of(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.netloc.lower()
+
+
+class RobotsCache:
+    """
+    robots.txt parsers per origin, kept for `ttl_seconds`. Missing files
+    (4xx) allow everything, as do network errors and 5xx responses, so an
+    unreachable robots.txt never blocks a scan.
+    """
+
+    def __init__(self, ttl_seconds: int = ROBOTS_TTL_SECONDS, max_entries: int = ROBOTS_CACHE_MAX_ENTRIES, user_agent: str = ROBOTS_USER_AGENT, client: Optional[httpx.AsyncClient] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.user_agent = user_agent
+        self._client = client
+        self._entries: "OrderedDict[str, Tuple[RobotFileParser, float]]" = OrderedDict()
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    async def get(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc.lower()}"
+        entry = self._entries.get(origin)
+        if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+            self._entries.move_to_end(origin)
+            robots_fetches_total.labels(outcome="cached").inc()
+            return entry[0]
+        lock = self._locks.get(origin)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[origin] = lock
+        # One fetch per origin, however many scans of it are queued
+        async with lock:
+            entry = self._entries.get(origin)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl_seconds:
+                return entry[0]
+            parser = await self._fetch(origin)
+            self._entries[origin] = (parser, time.monotonic())
+            self._entries.move_to_end(origin)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return parser
+
+    async def can_fetch(self, url: str) -> bool:
+        return (await self.get(url)).can_fetch(self.user_agent, url)
+
+    async def crawl_delay(self, url: str) -> Optional[float]:
+        delay = (await self.get(url)).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    async def _fetch(self, origin: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            resp = await self._get_client().get(f"{origin}/robots.txt")
+        except httpx.HTTPError as e:
+            logger.warning(f"Failed to fetch robots.txt for {origin}: {str(e)}")
+            robots_fetches_total.labels(outcome="error").inc()
+            parser.parse([])
+            return parser
+        if resp.status_code == 200:
+            robots_fetches_total.labels(outcome="fetched").inc()
+            parser.parse(resp.text.splitlines())
+        else:
+            robots_fetches_total.labels(outcome="missing" if resp.status_code < 500 else "error").inc()
+            parser.parse([])
+        return parser
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=ROBOTS_TIMEOUT_MS / 1000,
+                follow_redirects=True,
+                headers={"User-Agent": self.user_agent}
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class _HostState:
+    def __init__(self, concurrency: int):
+        self.slots = asyncio.Semaphore(concurrency)
+        self.spacing = asyncio.Lock()
+        self.next_start = 0.0
+        self.waiting = 0
+        self.active = 0
+
+
+class HostScheduler:
+    """
+    Admits scans at most `host_concurrency` at a time per host, starting
+    them at least `min_delay_ms` apart (or the robots.txt Crawl-delay when
+    larger), while up to `global_concurrency` scans of different hosts run
+    in parallel. The global slot is only taken once a scan is cleared to
+    start, so one busy host never holds up the rest of a batch.
+    """
+
+    def __init__(
+        self,
+        host_concurrency: int = POLITENESS_HOST_CONCURRENCY,
+        min_delay_ms: int = POLITENESS_MIN_DELAY_MS,
+        global_concurrency: int = POLITENESS_GLOBAL_CONCURRENCY,
+        respect_robots: bool = POLITENESS_RESPECT_ROBOTS,
+        robots: Optional[RobotsCache] = None,
+    ):
+        if host_concurrency < 1 or global_concurrency < 1:
+            raise ValueError("Politeness concurrency limits must be positive")
+        self.host_concurrency = host_concurrency
+        self.min_delay_s = min_delay_ms / 1000
+        self.respect_robots = respect_robots
+        self.robots = robots or RobotsCache()
+        self._global = asyncio.Semaphore(global_concurrency)
+        self._hosts: Dict[str, _HostState] = {}
+
+    async def allowed(self, url: str) -> bool:
+        """Whether robots.txt allows scanning `url` (always True when robots are not respected)."""
+        if not self.respect_robots:
+            return True
+        return await self.robots.can_fetch(url)
+
+    @asynccontextmanager
+    async def slot(self, url: str, check_robots: bool = True) -> AsyncIterator[None]:
+        """Wait for a politeness-cleared slot to scan `url`; raises RobotsDisallowed if robots.txt forbids it."""
+        if check_robots and not await self.allowed(url):
+            raise RobotsDisallowed(f"Disallowed by robots.txt: {url}")
+        host = host_of(url)
+        delay = self.min_delay_s
+        if self.respect_robots:
+            crawl_delay = await self.robots.crawl_delay(url)
+            if crawl_delay is not None:
+                delay = max(delay, min(crawl_delay, POLITENESS_MAX_CRAWL_DELAY_S))
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.host_concurrency)
+        wait_start = time.perf_counter()
+        state.waiting += 1
+        host_queue_depth.labels(host=host).set(state.waiting)
+        acquired_host = acquired_global = False
+        try:
+            await state.slots.acquire()
+            acquired_host = True
+            async with state.spacing:
+                pause = state.next_start - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                state.next_start = time.monotonic() + delay
+            await self._global.acquire()
+            acquired_global = True
+            state.waiting -= 1
+            state.active += 1
+            host_queue_depth.labels(host=host).set(state.waiting)
+            host_in_flight.labels(host=host).set(state.active)
+            politeness_delay_seconds.observe(time.perf_counter() - wait_start)
+            yield
+        finally:
+            if acquired_global:
+                state.active -= 1
+                self._global.release()
+            else:
+                state.waiting -= 1
+            if acquired_host:
+                state.slots.release()
+            self._release_host(host, state)
+
+    def _release_host(self, host: str, state: _HostState):
+        if state.waiting or state.active:
+            host_queue_depth.labels(host=host).set(state.waiting)
+            host_in_flight.labels(host=host).set(state.active)
+            return
+        # Drop idle hosts once their delay has elapsed so per-host state and label sets stay bounded
+        asyncio.get_running_loop().call_later(max(0.0, state.next_start - time.monotonic()), self._forget_host, host, state)
+
+    def _forget_host(self, host: str, state: _HostState):
+        if state.waiting or state.active or state.next_start > time.monotonic() or self._hosts.get(host) is not state:
+            return
+        del self._hosts[host]
+        for gauge in (host_queue_depth, host_in_flight):
+            try:
+                gauge.remove(host)
+            except KeyError:
+                pass
+
+    async def aclose(self):
+        await self.robots.aclose()
+
+
+_scheduler: Optional[HostScheduler] = None
+
+
+def get_scheduler() -> HostScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = HostScheduler()
+    return _scheduler
@@ -0,0 +1,128 @@
+"""
+Rules/sec microbenchmark: expressions parsed on every evaluation (as
+before rules were compiled at load, with Python tests run through eval)
+against the compiled rules.
+
+Runs over the shipped rule packs and two synthetic 1,000-rule packs asking
+the same questions: one by scanning the result's lists, one through the
+indexed feature view (features.py) and declarative conditions. Each runs
+against a scan result of typical size and one with ten times as many
+requests, cookies and scripts; indexed rules should not slow down with it.
+
+Usage: python rule_benchmark.py
+"""
+import json
+import time
+from typing import Callable, List
+
+import jmespath
+
+from features import build_features
+from rule_engine import Rule, get_rule_registry, search_data
+
+SYNTHETIC_RULES = 1000
+MIN_SECONDS = 1.0
+RESULT_SIZES = (120, 1200)
+
+def sample_scan_result(n_hosts: int = RESULT_SIZES[0]) -> dict:
+    hosts = [f"cdn{i}.tracker{i % 40}.example" for i in range(n_hosts)]
+    return {
+        "url": "https://www.example.com/",
+        "cookie_banner_detected": True,
+        "cookie_banner_selectors": ['[class*="cookie"]'],
+        "cookies": [{"name": f"cookie_{i}", "domain": f".site{i % 10}.example", "value": "x"} for i in range(n_hosts // 3)],
+        "network_requests": [f"https://{host}/p.js" for host in hosts],
+        "third_party_domains": sorted(set(hosts)),
+        "script_hashes": [{"script_url": f"https://{host}/p.js", "sha256": f"{i:064x}", "response_size": 1000} for i, host in enumerate(hosts)],
+        "robots_meta": None,
+    }
+
+SCANNING_TEMPLATES = [
+    ("jmespath", "!cookie_banner_detected"),
+    ("jmespath", "length(cookies) > `{i}`"),
+    ("jmespath", "contains(third_party_domains, 'cdn{i}.tracker{j}.example')"),
+    ("jmespath", "cookies[?name == 'cookie_{i}'] | length(@) > `0`"),
+    ("python", "len(result['cookies']) > {i}"),
+    ("python", "'cdn{i}.tracker{j}.example' in result['third_party_domains']"),
+]
+INDEXED_TEMPLATES = [
+    ("jmespath", "!cookie_banner_detected"),
+    ("jmespath", "features.counts.cookies > `{i}`"),
+    ("jmespath", "features.third_party_hosts.\"cdn{i}.tracker{j}.example\""),
+    ("condition", {"type": "cookie_presence", "value": False, "names": ["cookie_{i}"]}),
+    ("python", "features.counts.cookies > {i}"),
+    ("condition", {"type": "third_party_domain", "value": False, "domains": ["tracker{j}.example"]}),
+]
+
+def synthetic_rules(templates: list, n: int = SYNTHETIC_RULES) -> List[Rule]:
+    rules = []
+    for i in range(n):
+        test_type, template = templates[i % len(templates)]
+        if test_type == "condition":
+            condition = json.loads(json.dumps(template).replace("{i}", str(i % 100)).replace("{j}", str(i % 40)))
+            rules.append(Rule(f"synthetic_{i}", "", "low", test_type="condition", condition=condition))
+        else:
+            rules.append(Rule(f"synthetic_{i}", "", "low", template.format(i=i % 100, j=i % 40), test_type))
+    return rules
+
+def legacy_pass(rules: List[Rule], data: dict, features: dict) -> Callable[[], None]:
+    # What Rule.evaluate did before compiling at load: parse on every call.
+    # Condition rules had no such path (they failed to load), so they run compiled.
+    def run():
+        for rule in rules:
+            if rule.test_type == 'condition':
+                rule.evaluate_prepared(data, features)
+            elif rule.test_type == 'jmespath':
+                jmespath.search(rule.test, data)
+            else:
+                try:
+                    eval(rule.test, {}, {'result': data, 'features': features})
+                except Exception:
+                    pass
+    return run
+
+def compiled_pass(rules: List[Rule], data: dict, features: dict) -> Callable[[], None]:
+    def run():
+        for rule in rules:
+            rule.evaluate_prepared(data, features)
+    return run
+
+def rules_per_second(n_rules: int, run_pass: Callable[[], None]) -> float:
+    evaluations = 0
+    start = time.perf_counter()
+    while True:
+        run_pass()
+        evaluations += n_rules
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return evaluations / elapsed
+
+def view_build_ms(scan_result: dict, runs: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        build_features(scan_result)
+    return (time.perf_counter() - start) * 1000 / runs
+
+def main():
+    packs = {
+        "shipped": list(get_rule_registry().snapshot().rules),
+        "synthetic-scan": synthetic_rules(SCANNING_TEMPLATES),
+        "synthetic-index": synthetic_rules(INDEXED_TEMPLATES),
+    }
+    print(f"{'pack':<16} {'hosts':>6} {'rules':>6} {'parse/eval rules/s':>19} {'compiled rules/s':>17} {'speed-up':>9}")
+    for n_hosts in RESULT_SIZES:
+        scan_result = sample_scan_result(n_hosts)
+        # Built once per scan result, whatever the number of rules
+        features = build_features(scan_result)
+        data = search_data(scan_result, features)
+        for name, rules in packs.items():
+            if not rules:
+                print(f"{name:<16} {n_hosts:>6} {0:>6} (no rules to evaluate)")
+                continue
+            before = rules_per_second(len(rules), legacy_pass(rules, data, features))
+            after = rules_per_second(len(rules), compiled_pass(rules, data, features))
+            print(f"{name:<16} {n_hosts:>6} {len(rules):>6} {before:>19,.0f} {after:>17,.0f} {after / before:>8.1f}x")
+        print(f"{'feature view':<16} {n_hosts:>6} built once per scan in {view_build_ms(scan_result):.2f} ms")
+
+if __name__ == "__main__":
+    main()
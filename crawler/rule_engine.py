@@ -1,59 +1,280 @@
 import os
 import json
+import hashlib
+import logging
+import threading
+import time
 import jmespath
-from typing import List, Dict, Any, Callable
+from jmespath.exceptions import JMESPathError
+from safe_expr import compile_expression, SafeExprError, BudgetExceeded
+from conditions import compile_condition, ConditionError
+from features import build_features
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
 
 RULE_PACKS_DIR = os.path.join(os.path.dirname(__file__), '..', 'rule_packs')
+# Packs installed with `regula.py rules add`
+COMMUNITY_RULE_PACKS_DIR = os.path.join(RULE_PACKS_DIR, 'community')
+# How often (at most) the registry stats the pack files for changes
+RULE_PACKS_POLL_INTERVAL_S = float(os.getenv("RULE_PACKS_POLL_INTERVAL_S", "2"))
+
+class RuleCompileError(ValueError):
+    """Raised when a rule's test does not compile; reported per rule at load time."""
+
+    def __init__(self, rule_id: str, message: str):
+        super().__init__(f"Rule {rule_id}: {message}")
+        self.rule_id = rule_id
+
+def search_data(scan_result: dict, features: dict) -> dict:
+    """The scan result with its feature view under `features`, as JMESPath tests see it."""
+    return dict(scan_result, features=features)
 
 class Rule:
-    def __init__(self, rule_id: str, description: str, severity: str, test: str, test_type: str = 'jmespath'):
+    def __init__(self, rule_id: str, description: str, severity: str, test: Optional[str] = None, test_type: str = 'jmespath', condition: Optional[dict] = None):
         self.id = rule_id
         self.description = description
         self.severity = severity
         self.test = test
-        self.test_type = test_type  # 'jmespath' or 'python'
-
-    def evaluate(self, scan_result: dict) -> bool:
-        if self.test_type == 'jmespath':
-            return bool(jmespath.search(self.test, scan_result))
-        elif self.test_type == 'python':
-            # WARNING: eval is dangerous; in production, use a safe sandbox
+        self.test_type = test_type  # 'jmespath', 'python' or 'condition'
+        self.condition = condition
+        # Every format is compiled once here into a predicate over the scan result
+        if test_type == 'condition':
+            try:
+                self._predicate: Callable[[dict, dict], Any] = compile_condition(condition)
+            except ConditionError as e:
+                raise RuleCompileError(rule_id, f"invalid condition: {e}") from e
+        elif not isinstance(test, str):
+            raise RuleCompileError(rule_id, "missing test")
+        elif test_type == 'jmespath':
+            try:
+                expression = jmespath.compile(test)
+                self._predicate = lambda data, features: expression.search(data)
+            except JMESPathError as e:
+                raise RuleCompileError(rule_id, f"invalid JMESPath expression: {e}") from e
+            except RecursionError as e:
+                # jmespath's parser recurses once per nesting level
+                raise RuleCompileError(rule_id, "JMESPath expression is nested too deeply") from e
+        elif test_type == 'python':
+            # Restricted subset of Python compiled to closures; see safe_expr.py
             try:
-                return bool(eval(self.test, {}, {'result': scan_result}))
-            except Exception:
-                return False
+                self._predicate = compile_expression(test)
+            except SafeExprError as e:
+                raise RuleCompileError(rule_id, f"invalid expression: {e}") from e
         else:
-            raise ValueError(f"Unknown test_type: {self.test_type}")
+            raise RuleCompileError(rule_id, f"unknown test_type: {test_type}")
+
+    def evaluate(self, scan_result: dict, features: Optional[dict] = None) -> bool:
+        """
+        `features` is the indexed view of `scan_result` (features.py); pass it
+        when evaluating many rules so it is built once.
+        """
+        if features is None:
+            features = build_features(scan_result)
+        return self.evaluate_prepared(search_data(scan_result, features), features)
+
+    def evaluate_prepared(self, data: dict, features: dict) -> bool:
+        if self.test_type == 'jmespath':
+            # JMESPath type errors point at a broken rule and propagate as before
+            return bool(self._predicate(data, features))
+        try:
+            return bool(self._predicate(data, features))
+        except BudgetExceeded as e:
+            logger.warning(f"Rule {self.id} stopped: {e}")
+            return False
+        except Exception:
+            return False
 
     def to_dict(self):
-        return {
+        data = {
             'id': self.id,
             'description': self.description,
             'severity': self.severity,
-            'test': self.test,
             'test_type': self.test_type
         }
+        if self.test_type == 'condition':
+            data['condition'] = self.condition
+        else:
+            data['test'] = self.test
+        return data
+
+def rule_pack_files(dirs: Optional[List[str]] = None) -> List[str]:
+    """Pack paths in a stable order: shipped packs first, then community packs."""
+    paths = []
+    for directory in dirs or [RULE_PACKS_DIR, COMMUNITY_RULE_PACKS_DIR]:
+        if not os.path.isdir(directory):
+            continue
+        for fname in sorted(os.listdir(directory)):
+            if fname.endswith('.json'):
+                paths.append(os.path.join(directory, fname))
+    return paths
+
+def parse_rule_pack(data: dict, errors: Optional[Dict[str, str]] = None) -> List[Rule]:
+    """
+    Compiled rules of a pack. With `errors`, a rule that fails to compile is
+    recorded there under its id and skipped; otherwise the error is raised.
+    """
+    rules = []
+    for rule in data.get('rules', []):
+        try:
+            # Declarative packs (rule_packs/schema.json) carry a condition instead of a test
+            rules.append(Rule(
+                rule_id=rule['id'],
+                description=rule.get('description') or rule.get('name', ''),
+                severity=rule.get('severity', 'medium'),
+                test=rule.get('test'),
+                test_type='condition' if 'condition' in rule else rule.get('test_type', 'jmespath'),
+                condition=rule.get('condition')
+            ))
+        except (RuleCompileError, KeyError) as e:
+            if errors is None:
+                raise
+            errors[str(rule.get('id', '?'))] = str(e) if isinstance(e, RuleCompileError) else f"missing key {e}"
+    return rules
 
 def load_rules() -> List[Rule]:
     rules = []
-    for fname in os.listdir(RULE_PACKS_DIR):
-        if fname.endswith('.json'):
-            with open(os.path.join(RULE_PACKS_DIR, fname), 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for rule in data.get('rules', []):
-                    rules.append(Rule(
-                        rule_id=rule['id'],
-                        description=rule.get('description', ''),
-                        severity=rule.get('severity', 'medium'),
-                        test=rule['test'],
-                        test_type=rule.get('test_type', 'jmespath')
-                    ))
+    for path in rule_pack_files():
+        with open(path, 'r', encoding='utf-8') as f:
+            rules.extend(parse_rule_pack(json.load(f)))
     return rules
 
+class RuleSnapshot:
+    """
+    Immutable set of rules loaded from one state of the pack files. Scoring
+    holds on to the snapshot it started with, so a reload never changes the
+    rules under an evaluation in progress.
+    """
+
+    def __init__(self, rules: Tuple[Rule, ...], version: str, signature: tuple, errors: Dict[str, str], packs: Optional[Dict[str, Tuple[bytes, Tuple[Rule, ...]]]] = None):
+        self.rules = rules
+        # Content hash of every pack file; keys caches and stored results
+        self.version = version
+        self.signature = signature
+        # Pack path (or "path#rule id") -> load or compile error for what was skipped or kept
+        self.errors = errors
+        # Pack path -> (content, rules) of the last version of that pack that parsed
+        self.packs = packs or {}
+        self.loaded_at = time.time()
+
+    @classmethod
+    def load(cls, paths: List[str], previous: Optional["RuleSnapshot"] = None) -> "RuleSnapshot":
+        """
+        Load every pack in `paths`. A pack that fails to parse (for instance
+        one caught mid-write) keeps its rules from `previous`, with the
+        error recorded, rather than dropping out of the new snapshot.
+        """
+        # Taken before reading, so a file edited mid-load differs at the next poll
+        signature = file_signature(paths)
+        rules: List[Rule] = []
+        errors: Dict[str, str] = {}
+        packs: Dict[str, Tuple[bytes, Tuple[Rule, ...]]] = {}
+        digest = hashlib.sha256()
+        for path in paths:
+            content = b''
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                rule_errors: Dict[str, str] = {}
+                pack_rules = tuple(parse_rule_pack(json.loads(content), rule_errors))
+            except (OSError, ValueError, TypeError, AttributeError, RecursionError) as e:
+                last_good = previous.packs.get(path) if previous is not None else None
+                if last_good is None:
+                    logger.warning(f"Skipping rule pack {path}: {e!r}")
+                    errors[path] = repr(e)
+                    digest.update(os.path.relpath(path, RULE_PACKS_DIR).encode('utf-8'))
+                    digest.update(content)
+                    continue
+                logger.warning(f"Keeping last good version of rule pack {path}: {e!r}")
+                errors[path] = f"{e!r} (kept {len(last_good[1])} rules from the last good version)"
+                content, pack_rules = last_good
+            else:
+                for rule_id, error in rule_errors.items():
+                    logger.warning(f"Skipping rule {rule_id} in {path}: {error}")
+                    errors[f"{path}#{rule_id}"] = error
+            # The version hashes the content the rules were actually compiled from
+            digest.update(os.path.relpath(path, RULE_PACKS_DIR).encode('utf-8'))
+            digest.update(content)
+            packs[path] = (content, pack_rules)
+            rules.extend(pack_rules)
+        return cls(tuple(rules), digest.hexdigest()[:16], signature, errors, packs)
+
+def file_signature(paths: List[str]) -> tuple:
+    """(path, mtime, size) per pack file; any edit, addition or removal changes it."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        signature.append((path, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+class RuleRegistry:
+    """
+    Process-wide rule cache. Packs are parsed once; afterwards the pack
+    directories are polled (at most every `poll_interval_s`) and a changed
+    file signature loads a new snapshot, which replaces the old one with a
+    single reference swap. Callers never wait for a reload that another
+    thread is already running; they keep using the current snapshot.
+    """
+
+    def __init__(self, dirs: Optional[List[str]] = None, poll_interval_s: float = RULE_PACKS_POLL_INTERVAL_S):
+        self.dirs = dirs
+        self.poll_interval_s = poll_interval_s
+        self._snapshot: Optional[RuleSnapshot] = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    def snapshot(self) -> RuleSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._load()
+            return self._snapshot  # type: ignore[return-value]
+        if time.monotonic() - self._checked_at >= self.poll_interval_s and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = time.monotonic()
+                if file_signature(rule_pack_files(self.dirs)) != snapshot.signature:
+                    self._load()
+            finally:
+                self._lock.release()
+        return self._snapshot  # type: ignore[return-value]
+
+    def reload(self) -> RuleSnapshot:
+        with self._lock:
+            self._load()
+        return self._snapshot  # type: ignore[return-value]
+
+    def _load(self):
+        paths = rule_pack_files(self.dirs)
+        snapshot = RuleSnapshot.load(paths, self._snapshot)
+        self._checked_at = time.monotonic()
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if previous is not None and previous.version != snapshot.version:
+            logger.info(f"Rule packs reloaded: version {previous.version} -> {snapshot.version}, {len(snapshot.rules)} rules")
+
+_registry: Optional[RuleRegistry] = None
+
+def get_rule_registry() -> RuleRegistry:
+    global _registry
+    if _registry is None:
+        _registry = RuleRegistry()
+    return _registry
+
+def rule_pack_version() -> str:
+    """Content hash of the rule packs, so cached and stored results can be keyed by it."""
+    return get_rule_registry().snapshot().version
+
 def evaluate_rules(scan_result: dict, rules: List[Rule]) -> List[Dict[str, Any]]:
+    # Indexed once, so each rule costs a few lookups rather than a pass over the result
+    features = build_features(scan_result)
+    data = search_data(scan_result, features)
     violations = []
     for rule in rules:
-        if rule.evaluate(scan_result):
+        if rule.evaluate_prepared(data, features):
             violations.append({
                 'id': rule.id,
                 'description': rule.description,
@@ -75,7 +296,7 @@ if __name__ == "__main__":
         description="No cookie banner detected on the page",
         severity="high",
         test="!cookie_banner_detected",
-        test_type="python"
+        test_type="jmespath"
     )
     violations = evaluate_rules(scan_result, [example_rule])
     print(json.dumps(violations, indent=2)) 
\ No newline at end of file
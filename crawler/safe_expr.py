@@ -0,0 +1,263 @@
+"""
+Restricted expression language for rule tests (test_type "python").
+
+A test is parsed with Python's own parser, but only a whitelisted subset of
+the tree is accepted: constants, `result`, `features` (the indexed view
+from features.py) and comprehension variables,
+attribute or key access, comparisons and membership, and/or/not, list and
+tuple literals, `len`, `any`/`all`, and generator or list comprehensions
+over lists. Anything else (other names and calls, dunder attributes,
+lambdas, imports, assignments) is rejected when the rule loads.
+
+Accepted trees are compiled into nested closures, so evaluation never goes
+through `eval`. Every comprehension item and every membership test over a
+container is charged against a step budget, and the wall-clock limit is
+checked while steps are being charged, so one pathological rule cannot
+stall scoring. Trees nested deeper than MAX_DEPTH are rejected as well.
+
+    check = compile_expression("any(c['name'] == '_ga' for c in result.cookies)")
+    check({"cookies": [{"name": "_ga"}]})   # True
+"""
+import ast
+import os
+import time
+from typing import Any, Callable, Dict, FrozenSet, Optional
+
+MAX_STEPS = int(os.getenv("RULE_MAX_STEPS", "100000"))
+TIME_LIMIT_MS = int(os.getenv("RULE_TIME_LIMIT_MS", "50"))
+MAX_EXPRESSION_LENGTH = 2000
+# Deepest accepted syntax tree; compiling and evaluating recurse once per level
+MAX_DEPTH = 64
+# The clock is read once every this many steps
+CLOCK_INTERVAL = 256
+
+FUNCTIONS = {"len": len, "any": any, "all": all}
+COMPARISONS = {
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.Is: lambda a, b: a is b,
+    ast.IsNot: lambda a, b: a is not b,
+}
+
+# A compiled node: takes the run state and the variable bindings
+Node = Callable[["_Run", Dict[str, Any]], Any]
+
+
+class SafeExprError(ValueError):
+    """Raised at compile time for syntax or constructs outside the whitelist."""
+
+
+class BudgetExceeded(RuntimeError):
+    """Raised at evaluation time when a test runs past its step or time budget."""
+
+
+class _Run:
+    __slots__ = ("steps_left", "deadline", "until_clock")
+
+    def __init__(self, max_steps: int, time_limit_ms: int):
+        self.steps_left = max_steps
+        self.deadline = time.perf_counter() + time_limit_ms / 1000
+        self.until_clock = CLOCK_INTERVAL
+
+    def charge(self, steps: int = 1):
+        self.steps_left -= steps
+        if self.steps_left < 0:
+            raise BudgetExceeded("step budget exhausted")
+        self.until_clock -= steps
+        if self.until_clock <= 0:
+            self.until_clock = CLOCK_INTERVAL
+            if time.perf_counter() > self.deadline:
+                raise BudgetExceeded("time limit exceeded")
+
+
+class CompiledExpression:
+    """A compiled test; calling it evaluates the expression against `result`."""
+
+    def __init__(self, source: str, root: Node, max_steps: int, time_limit_ms: int):
+        self.source = source
+        self._root = root
+        self.max_steps = max_steps
+        self.time_limit_ms = time_limit_ms
+
+    def __call__(self, result: Any, features: Optional[dict] = None) -> Any:
+        return self._root(_Run(self.max_steps, self.time_limit_ms), {"result": result, "features": features})
+
+
+def compile_expression(source: str, max_steps: int = MAX_STEPS, time_limit_ms: int = TIME_LIMIT_MS) -> CompiledExpression:
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise SafeExprError(f"expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise SafeExprError(f"syntax error: {e.msg}") from e
+    except (RecursionError, MemoryError) as e:
+        # The parser itself gives up on some pathological nesting
+        raise SafeExprError("expression is nested too deeply") from e
+    if _depth(tree.body) > MAX_DEPTH:
+        raise SafeExprError(f"expression is nested deeper than {MAX_DEPTH} levels")
+    return CompiledExpression(source, _compile(tree.body, frozenset({"result", "features"})), max_steps, time_limit_ms)
+
+
+def _depth(root: ast.AST) -> int:
+    # Iterative, so that measuring a deep tree cannot overflow the stack itself
+    deepest = 0
+    stack = [(root, 1)]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        stack.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+    return deepest
+
+
+def _compile(node: ast.AST, scope: FrozenSet[str]) -> Node:
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (str, int, float, bool, type(None))):
+            raise SafeExprError(f"unsupported constant {node.value!r}")
+        value = node.value
+        return lambda run, env: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name not in scope:
+            raise SafeExprError(f"unknown name '{name}'")
+        return lambda run, env: env[name]
+
+    if isinstance(node, ast.Attribute):
+        attr = node.attr
+        if attr.startswith("_"):
+            raise SafeExprError(f"private attribute '{attr}' is not allowed")
+        target = _compile(node.value, scope)
+        # Attribute access reads keys of the scan result's dicts
+        return lambda run, env: target(run, env)[attr]
+
+    if isinstance(node, ast.Subscript):
+        if isinstance(node.slice, ast.Slice):
+            raise SafeExprError("slices are not allowed")
+        target = _compile(node.value, scope)
+        key = _compile(node.slice, scope)
+        return lambda run, env: target(run, env)[key(run, env)]
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile(v, scope) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def and_(run, env):
+                value = True
+                for operand in operands:
+                    value = operand(run, env)
+                    if not value:
+                        return value
+                return value
+            return and_
+
+        def or_(run, env):
+            value = False
+            for operand in operands:
+                value = operand(run, env)
+                if value:
+                    return value
+            return value
+        return or_
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand, scope)
+        if isinstance(node.op, ast.Not):
+            return lambda run, env: not operand(run, env)
+        if isinstance(node.op, ast.USub):
+            return lambda run, env: -operand(run, env)
+        raise SafeExprError(f"unsupported operator {type(node.op).__name__}")
+
+    if isinstance(node, ast.Compare):
+        return _compile_compare(node, scope)
+
+    if isinstance(node, (ast.List, ast.Tuple)):
+        items = [_compile(e, scope) for e in node.elts]
+        return lambda run, env: [item(run, env) for item in items]
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise SafeExprError(f"only {', '.join(FUNCTIONS)} may be called")
+        if node.keywords or len(node.args) != 1 or isinstance(node.args[0], ast.Starred):
+            raise SafeExprError(f"{node.func.id}() takes exactly one positional argument")
+        func = FUNCTIONS[node.func.id]
+        if isinstance(node.args[0], ast.GeneratorExp):
+            if func is len:
+                raise SafeExprError("len() of a generator is not allowed")
+            # Consumed right away, so any() and all() can stop at the first decisive item
+            arg = _compile_comprehension(node.args[0], scope)
+        else:
+            arg = _compile(node.args[0], scope)
+        return lambda run, env: func(arg(run, env))
+
+    if isinstance(node, ast.ListComp):
+        generate = _compile_comprehension(node, scope)
+        return lambda run, env: list(generate(run, env))
+
+    raise SafeExprError(f"{type(node).__name__} is not allowed in rule expressions")
+
+
+def _compile_compare(node: ast.Compare, scope: FrozenSet[str]) -> Node:
+    left = _compile(node.left, scope)
+    steps = []
+    for op, comparator in zip(node.ops, node.comparators):
+        right = _compile(comparator, scope)
+        if isinstance(op, (ast.In, ast.NotIn)):
+            negate = isinstance(op, ast.NotIn)
+
+            def contains(run, a, b, negate=negate):
+                # Membership scans lists and strings, so it costs their length
+                run.charge(len(b) if isinstance(b, (list, tuple, str)) else 1)
+                return (a not in b) if negate else (a in b)
+            steps.append((contains, right))
+        elif type(op) in COMPARISONS:
+            compare = COMPARISONS[type(op)]
+            steps.append((lambda run, a, b, compare=compare: compare(a, b), right))
+        else:
+            raise SafeExprError(f"unsupported comparison {type(op).__name__}")
+
+    def compare_chain(run, env):
+        a = left(run, env)
+        for test, right in steps:
+            b = right(run, env)
+            if not test(run, a, b):
+                return False
+            a = b
+        return True
+    return compare_chain
+
+
+def _compile_comprehension(node, scope: FrozenSet[str]) -> Node:
+    if len(node.generators) != 1:
+        raise SafeExprError("only one 'for' clause is allowed per comprehension")
+    generator = node.generators[0]
+    if generator.is_async or not isinstance(generator.target, ast.Name):
+        raise SafeExprError("comprehension targets must be a single name")
+    name = generator.target.id
+    if name in FUNCTIONS or name.startswith("_"):
+        raise SafeExprError(f"invalid comprehension variable '{name}'")
+    iterable = _compile(generator.iter, scope)
+    inner_scope = scope | {name}
+    conditions = [_compile(c, inner_scope) for c in generator.ifs]
+    element = _compile(node.elt, inner_scope)
+
+    def generate(run, env):
+        items = iterable(run, env)
+        if not isinstance(items, (list, tuple)):
+            raise TypeError("comprehensions iterate over lists only")
+        outer: Optional[Any] = env.get(name)
+        bound = name in env
+        try:
+            for item in items:
+                run.charge()
+                env[name] = item
+                if all(condition(run, env) for condition in conditions):
+                    yield element(run, env)
+        finally:
+            if bound:
+                env[name] = outer
+            else:
+                env.pop(name, None)
+    return generate
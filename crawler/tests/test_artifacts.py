@@ -0,0 +1,45 @@
+import os
+
+from artifacts import ArtifactStore, LocalArtifactBackend
+
+def test_identical_artifacts_are_stored_once(tmp_path):
+    backend = LocalArtifactBackend(root=str(tmp_path), max_bytes=10 * 1024 * 1024)
+    store = ArtifactStore(backend)
+    html = b"<html><body>We use cookies</body></html>"
+    ref1 = store.put(html)
+    ref2 = store.put(html)
+    assert ref1 == ref2
+    assert ref1.startswith("sha256:")
+    assert len(backend) == 1
+    assert store.get(ref1) == html
+
+def test_lru_eviction_keeps_recently_used(tmp_path):
+    # Random bytes do not compress, so every artifact takes the same space
+    blobs = [os.urandom(4096) for _ in range(3)]
+    backend = LocalArtifactBackend(root=str(tmp_path), max_bytes=10 ** 9)
+    store = ArtifactStore(backend)
+    refs = [store.put(b) for b in blobs[:2]]
+    # Touch the oldest artifact, then leave room for two artifacts only
+    assert store.get(refs[0]) == blobs[0]
+    backend.max_bytes = backend.total_bytes
+    refs.append(store.put(blobs[2]))
+    assert len(backend) == 2
+    assert store.get(refs[1]) is None
+    assert store.get(refs[0]) == blobs[0]
+    assert store.get(refs[2]) == blobs[2]
+
+def test_artifact_removed_by_another_worker_is_a_miss(tmp_path):
+    backend = LocalArtifactBackend(root=str(tmp_path))
+    store = ArtifactStore(backend)
+    ref = store.put(b"page html")
+    for dirpath, _, filenames in os.walk(tmp_path):
+        for name in filenames:
+            os.remove(os.path.join(dirpath, name))
+    assert store.get(ref) is None
+    assert len(backend) == 0 and backend.total_bytes == 0
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    store = ArtifactStore(LocalArtifactBackend(root=str(tmp_path)))
+    ref = store.put(b"screenshot bytes")
+    reopened = ArtifactStore(LocalArtifactBackend(root=str(tmp_path)))
+    assert reopened.get(ref) == b"screenshot bytes"
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserPool
+
+class FakeContext:
+    async def close(self):
+        pass
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **kwargs):
+        return FakeContext()
+
+    async def close(self):
+        self.closed = True
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = []
+        self.failures = 0
+
+    async def launch(self, **kwargs):
+        await asyncio.sleep(0)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("launch failed")
+        browser = FakeBrowser()
+        self.launched.append(browser)
+        return browser
+
+class FakePlaywright:
+    def __init__(self):
+        self.chromium = FakeChromium()
+
+    async def stop(self):
+        pass
+
+@pytest.fixture
+def fake_playwright(monkeypatch):
+    playwright = FakePlaywright()
+
+    class Starter:
+        async def start(self):
+            return playwright
+    monkeypatch.setattr(browser_pool, "async_playwright", Starter)
+    monkeypatch.setattr(browser_pool, "_process_tree_rss_mb", lambda pooled: 100.0)
+    return playwright
+
+async def lease(pool):
+    async with pool.context() as context:
+        return context
+
+@pytest.mark.asyncio
+async def test_browser_is_recycled_after_max_scans(fake_playwright):
+    pool = BrowserPool(size=1, contexts_per_browser=2, max_scans_per_browser=2, max_rss_mb=0)
+    await pool.start()
+    first = fake_playwright.chromium.launched[0]
+    await lease(pool)
+    assert not first.closed
+    await lease(pool)
+    assert first.closed
+    assert [b.browser for b in pool._browsers] == [fake_playwright.chromium.launched[1]]
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_browser_is_recycled_over_rss_limit(fake_playwright):
+    pool = BrowserPool(size=1, max_scans_per_browser=100, max_rss_mb=50)
+    await pool.start()
+    await lease(pool)
+    assert fake_playwright.chromium.launched[0].closed
+    assert len(fake_playwright.chromium.launched) == 2
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_disconnected_browser_is_replaced_on_checkout(fake_playwright):
+    pool = BrowserPool(size=1, max_rss_mb=0)
+    await pool.start()
+    first = fake_playwright.chromium.launched[0]
+    first.connected = False
+    async with pool.context():
+        assert pool._browsers[0].browser is fake_playwright.chromium.launched[1]
+    assert first.closed
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_retired_browser_drains_in_flight_scans(fake_playwright):
+    pool = BrowserPool(size=1, contexts_per_browser=2, max_scans_per_browser=1, max_rss_mb=0)
+    await pool.start()
+    first = fake_playwright.chromium.launched[0]
+    async with pool.context():
+        await lease(pool)
+        # Retired and replaced, but still serving the outer scan
+        assert not first.closed
+        assert len(fake_playwright.chromium.launched) == 2
+        assert [b.browser for b in pool._draining] == [first]
+    assert first.closed
+    assert pool._draining == []
+    await pool.close()
+
+@pytest.mark.asyncio
+async def test_failed_replacement_still_closes_retired_browser(fake_playwright):
+    pool = BrowserPool(size=1, max_scans_per_browser=1, max_rss_mb=0)
+    await pool.start()
+    first = fake_playwright.chromium.launched[0]
+    fake_playwright.chromium.failures = 1
+    await lease(pool)
+    assert first.closed
+    assert pool._browsers == [] and pool._draining == []
+    # The next lease launches the missing browser
+    async with pool.context():
+        assert [b.browser for b in pool._browsers] == fake_playwright.chromium.launched[1:]
+    await pool.close()
@@ -0,0 +1,104 @@
+import asyncio
+
+import httpx
+import pytest
+
+import crawl
+from crawl import VisitedSet, SiteAggregate, site_of, is_crawlable, fetch_sitemap_urls
+from urls import normalize_url
+
+def test_normalize_url():
+    assert normalize_url("HTTPS://Www.Example.com:443//checkout/?utm_source=news&fbclid=1&b=2&a=1#top") == "https://www.example.com/checkout?a=1&b=2"
+    assert normalize_url("http://example.com") == "http://example.com/"
+    assert normalize_url("http://example.com:8080/a/") == "http://example.com:8080/a"
+
+def test_visited_set_has_no_false_negatives():
+    visited = VisitedSet(capacity=1000)
+    urls = [f"https://example.com/page/{i}" for i in range(1000)]
+    for url in urls:
+        visited.add(url)
+    assert all(url in visited for url in urls)
+    false_positives = sum(f"https://example.com/other/{i}" in visited for i in range(10000))
+    assert false_positives < 50
+
+def test_same_site_and_crawlable():
+    assert site_of("https://www.example.com/a") == site_of("https://example.com/b")
+    assert is_crawlable("https://example.com/privacy")
+    assert not is_crawlable("https://example.com/brochure.pdf")
+    assert not is_crawlable("mailto:privacy@example.com")
+
+def test_site_aggregate():
+    aggregate = SiteAggregate("https://example.com/")
+    aggregate.add({"url": "https://example.com/", "cookie_banner_detected": True, "cookies": [{"name": "sid"}],
+                   "third_party_domains": ["cdn.example.net"], "score": 70,
+                   "violations": [{"id": "cookies_before_consent", "severity": "high"}]})
+    aggregate.add({"url": "https://example.com/checkout", "cookie_banner_detected": False, "cookies": [],
+                   "third_party_domains": ["js.stripe.com"], "score": 40,
+                   "violations": [{"id": "cookies_before_consent", "severity": "high"}]})
+    aggregate.add({"url": "https://example.com/broken", "error": "timeout"})
+    summary = aggregate.summary(1234)
+    assert summary["pages_scanned"] == 2 and summary["pages_failed"] == 1
+    assert summary["pages_with_banner"] == 1
+    assert summary["third_party_domains"] == ["cdn.example.net", "js.stripe.com"]
+    assert summary["violations"][0]["pages"] == 2
+    assert summary["min_score"] == 40 and summary["avg_score"] == 55.0
+
+SITEMAP_INDEX = b"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <sitemap><loc>https://example.com/pages.xml</loc></sitemap>
+  <sitemap><loc>https://example.com/bomb.xml</loc></sitemap>
+</sitemapindex>"""
+SITEMAP_PAGES = b"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+  <url><loc>https://example.com/privacy</loc></url>
+  <url><loc> https://example.com/checkout </loc></url>
+</urlset>"""
+SITEMAP_BOMB = b"""<?xml version="1.0"?>
+<!DOCTYPE urlset [<!ENTITY a "aaaaaaaaaa"><!ENTITY b "&a;&a;&a;&a;&a;&a;&a;&a;&a;&a;">]>
+<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"><url><loc>https://example.com/&b;</loc></url></urlset>"""
+
+def test_sitemap_index_is_followed_and_entity_declarations_are_refused(monkeypatch):
+    files = {"/sitemap.xml": SITEMAP_INDEX, "/pages.xml": SITEMAP_PAGES, "/bomb.xml": SITEMAP_BOMB}
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=files[request.url.path]))
+    client = httpx.AsyncClient
+    monkeypatch.setattr(crawl.httpx, "AsyncClient", lambda **kwargs: client(transport=transport, **kwargs))
+    urls = asyncio.run(fetch_sitemap_urls("https://example.com/sitemap.xml", limit=10))
+    assert urls == ["https://example.com/privacy", "https://example.com/checkout"]
+
+def test_disconnect_waits_for_cancelled_scans_before_closing_the_pool(monkeypatch):
+    events = []
+
+    class FakePool:
+        def __init__(self, **kwargs):
+            pass
+
+        async def start(self):
+            pass
+
+        async def close(self):
+            events.append("pool_closed")
+
+    async def fake_run_scan(url, **kwargs):
+        if url.endswith("/"):
+            return {"url": url, "links": [f"https://example.com/page{i}" for i in range(3)]}
+        try:
+            await asyncio.sleep(60)
+        finally:
+            # Stands in for closing the scan's browser context
+            await asyncio.sleep(0)
+            events.append("context_released")
+
+    monkeypatch.setattr(crawl, "BrowserPool", FakePool)
+    monkeypatch.setattr(crawl, "run_scan", fake_run_scan)
+
+    async def main():
+        stream = crawl.crawl_site("https://example.com/", max_pages=4, concurrency=4)
+        assert (await stream.__anext__())["url"] == "https://example.com/"
+        waiting = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.01)
+        # The client goes away while the linked pages are being scanned
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+    asyncio.run(main())
+    assert events == ["context_released"] * 3 + ["pool_closed"]
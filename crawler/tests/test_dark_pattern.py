@@ -0,0 +1,25 @@
+import dark_pattern
+
+class FakeClassifier:
+    def __init__(self):
+        self.batches = []
+
+    def classify_batch(self, imgs):
+        self.batches.append(len(imgs))
+        return [{label: 0.0 for label in dark_pattern.LABELS} for _ in imgs]
+
+def test_warm_up_runs_dummy_batch(monkeypatch):
+    fake = FakeClassifier()
+    monkeypatch.setattr(dark_pattern, "_classifier", fake)
+    timings = dark_pattern.warm_up(batch_size=3)
+    assert fake.batches == [3]
+    assert set(timings) == {"load_ms", "first_batch_ms"}
+
+def test_model_source_prefers_pinned_weights(monkeypatch, tmp_path):
+    monkeypatch.setattr(dark_pattern, "DARK_PATTERN_MODEL_DIR", "")
+    assert dark_pattern.model_source() == (dark_pattern.MODEL_NAME, {})
+    monkeypatch.setattr(dark_pattern, "DARK_PATTERN_MODEL_DIR", str(tmp_path))
+    monkeypatch.setenv("HF_HUB_OFFLINE", "0")
+    assert dark_pattern.model_source() == (str(tmp_path), {"local_files_only": True})
+    # Offline loading goes through from_pretrained, not the process environment
+    assert dark_pattern.os.environ["HF_HUB_OFFLINE"] == "0"
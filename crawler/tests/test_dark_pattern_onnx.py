@@ -0,0 +1,42 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+np = pytest.importorskip("numpy")
+from PIL import Image
+
+from dark_pattern import DarkPatternClassifier
+from dark_pattern_onnx import OnnxDarkPatternClassifier, build_model, model_path
+
+@pytest.fixture(scope="module")
+def torch_classifier():
+    torch.manual_seed(0)
+    try:
+        return DarkPatternClassifier()
+    except OSError as e:
+        pytest.skip(f"Model weights unavailable: {e}")
+
+@pytest.fixture(scope="module")
+def images():
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, (400, 600, 3), dtype=np.uint8)) for _ in range(4)]
+
+@pytest.mark.parametrize("quantize,atol", [(False, 1e-3), (True, 1e-1)])
+def test_onnx_logits_match_torch(torch_classifier, images, tmp_path_factory, quantize, atol):
+    # Export from the same torch instance so both backends share the classification head
+    model_dir = str(tmp_path_factory.getbasetemp() / "onnx")
+    path = build_model(quantize=quantize, model_dir=model_dir, model=torch_classifier.model)
+    onnx_classifier = OnnxDarkPatternClassifier(path=path, intra_op_threads=1)
+
+    expected = torch_classifier.predict_logits(images)
+    actual = onnx_classifier.predict_logits(images)
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected, atol=atol)
+    if not quantize:
+        assert (actual.argmax(axis=1) == expected.argmax(axis=1)).all()
+
+def test_missing_model_is_not_exported_at_runtime(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        OnnxDarkPatternClassifier(path=model_path(True, str(tmp_path)))
+    assert list(tmp_path.iterdir()) == []
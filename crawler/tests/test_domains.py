@@ -0,0 +1,42 @@
+import time
+
+from domains import get_public_suffix_list, get_tracker_index, site_of_host, tracker_for_host, is_third_party
+
+def test_registrable_domain():
+    psl = get_public_suffix_list()
+    assert psl.registrable_domain("www.example.com") == "example.com"
+    assert psl.registrable_domain("static.cdn.example.co.uk") == "example.co.uk"
+    assert psl.registrable_domain("co.uk") is None
+    # Wildcard and exception rules (*.ck, !www.ck)
+    assert psl.registrable_domain("shop.foo.ck") == "shop.foo.ck"
+    assert psl.registrable_domain("www.ck") == "www.ck"
+    # Private section: each GitHub Pages user is its own site
+    assert psl.registrable_domain("alice.github.io") == "alice.github.io"
+    # Unlisted TLDs fall back to the implicit "*" rule
+    assert psl.registrable_domain("a.b.internal-tld") == "b.internal-tld"
+
+def test_site_of_host():
+    assert site_of_host("static.example.com") == site_of_host("www.example.com") == "example.com"
+    assert site_of_host("Example.com:443") == "example.com"
+    assert site_of_host("127.0.0.1") == "127.0.0.1"
+    assert site_of_host("localhost") == "localhost"
+    assert not is_third_party("static.example.com", "example.com")
+    assert is_third_party("example.net", "example.com")
+
+def test_tracker_index():
+    assert tracker_for_host("stats.g.doubleclick.net")["category"] == "advertising"
+    assert tracker_for_host("www.google-analytics.com")["category"] == "analytics"
+    assert tracker_for_host("d1234.cloudfront.net")["category"] == "cdn"
+    # The most specific listed domain wins
+    assert tracker_for_host("connect.facebook.net")["domain"] == "connect.facebook.net"
+    assert tracker_for_host("www.facebook.com")["category"] == "social"
+    assert tracker_for_host("example.com") is None
+
+def test_lookups_are_cheap():
+    psl, index = get_public_suffix_list(), get_tracker_index()
+    hosts = [f"asset{i}.cdn{i % 50}.example{i % 7}.co.uk" for i in range(20000)]
+    start = time.perf_counter()
+    for host in hosts:
+        psl.registrable_domain(host)
+        index.match(host)
+    assert time.perf_counter() - start < 1.0
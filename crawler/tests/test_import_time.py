@@ -0,0 +1,18 @@
+import os
+
+import pytest
+from import_benchmark import check_module
+
+MODULES = ["scan", "lambda_handler", "dark_pattern", "rule_engine"]
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_defers_heavy_modules(module):
+    problems = check_module(module, runs=1, enforce_budget=False)
+    assert not problems, "; ".join(problems)
+
+# Wall-clock budgets depend on the machine; opt in where timings are stable
+@pytest.mark.skipif(os.getenv("IMPORT_BUDGETS") != "1", reason="set IMPORT_BUDGETS=1 to enforce import-time budgets")
+@pytest.mark.parametrize("module", MODULES)
+def test_import_within_budget(module):
+    problems = check_module(module)
+    assert not problems, "; ".join(problems)
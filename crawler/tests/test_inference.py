@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+from inference import MicroBatcher
+
+def test_micro_batcher_batches_concurrent_requests():
+    batches = []
+    threads = set()
+
+    def double(items):
+        batches.append(list(items))
+        threads.add(threading.current_thread().name)
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(double, name="test", max_batch_size=4, max_wait_ms=50)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(main()) == [i * 2 for i in range(10)]
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert threads == {"test-inference_0"}
+
+def test_micro_batcher_does_not_wait_past_max_wait():
+    async def main():
+        batcher = MicroBatcher(lambda items: items, name="test", max_batch_size=64, max_wait_ms=10)
+        result = await asyncio.wait_for(batcher.submit("only"), timeout=1)
+        await batcher.stop()
+        return result
+
+    assert asyncio.run(main()) == "only"
+
+def test_micro_batcher_propagates_errors():
+    def fail(items):
+        raise ValueError("model exploded")
+
+    async def main():
+        batcher = MicroBatcher(fail, name="test", max_batch_size=2, max_wait_ms=10)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
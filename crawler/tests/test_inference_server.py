@@ -0,0 +1,55 @@
+import asyncio
+import threading
+
+import pytest
+from PIL import Image
+
+from inference_server import InferenceClient, InferenceServerError, serve
+
+class PixelClassifier:
+    """Echoes what it received so the shared-memory transport can be checked."""
+
+    def classify_batch(self, imgs):
+        return [{"width": img.width, "height": img.height, "first_pixel": list(img.getpixel((0, 0)))} for img in imgs]
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # Client and server share this process (and its resource tracker) here, unlike in production
+    monkeypatch.setattr("inference_server.resource_tracker.unregister", lambda name, rtype: None)
+    socket_path = str(tmp_path / "inference.sock")
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        started = asyncio.Event()
+        task = loop.create_task(serve(socket_path, classifier=PixelClassifier(), ready=started))
+        loop.run_until_complete(started.wait())
+        ready.set()
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield socket_path
+    loop.call_soon_threadsafe(lambda: [t.cancel() for t in asyncio.all_tasks(loop)])
+    thread.join(5)
+
+def test_client_classifies_through_shared_memory(server):
+    client = InferenceClient(server)
+    imgs = [Image.new("RGB", (640, 360), (10, 20, 30)), Image.new("RGBA", (200, 100), (200, 100, 50, 255))]
+    assert client.classify_batch(imgs) == [
+        {"width": 640, "height": 360, "first_pixel": [10, 20, 30]},
+        {"width": 200, "height": 100, "first_pixel": [200, 100, 50]},
+    ]
+    # The connection is reused for later calls
+    assert client.ping()["ok"] is True
+    client.close()
+
+def test_client_reports_unreachable_server(tmp_path):
+    client = InferenceClient(str(tmp_path / "missing.sock"))
+    with pytest.raises(InferenceServerError):
+        client.classify_batch([Image.new("RGB", (10, 10))])
@@ -0,0 +1,80 @@
+import asyncio
+import random
+
+from PIL import Image, ImageDraw
+
+import scan
+from phash_cache import BKTree, PerceptualHashCache, dhash, hamming
+
+def banner_screenshot(text_offset=0, color=(30, 30, 30)):
+    img = Image.new("RGB", (1280, 720), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((0, 560, 1280, 720), fill=color)
+    draw.rectangle((1000 + text_offset, 610, 1200 + text_offset, 670), fill=(0, 120, 255))
+    return img
+
+def test_dhash_is_stable_for_near_identical_screenshots():
+    base = dhash(banner_screenshot())
+    assert hamming(base, dhash(banner_screenshot(text_offset=3))) <= 4
+    fading = Image.linear_gradient("L").rotate(-90).resize((1280, 720))
+    assert hamming(base, dhash(fading)) > 4
+
+def test_bk_tree_matches_brute_force():
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    tree = BKTree()
+    for h in hashes:
+        tree.add(h)
+    for _ in range(50):
+        query = rng.choice(hashes) ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+        expected = min(hamming(query, h) for h in hashes)
+        match = tree.nearest(query, 4)
+        assert match is not None and match[1] == expected
+
+def test_cache_hit_rate_and_persistence(tmp_path):
+    path = str(tmp_path / "phash.json")
+    cache = PerceptualHashCache(max_distance=4, path=path, namespace="vit:torch")
+    phash = dhash(banner_screenshot())
+    assert cache.get(phash) is None
+    cache.put(phash, {"Sneaking": 0.9})
+    assert cache.get(phash ^ 1) == ({"Sneaking": 0.9}, 1)
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+    cache.save()
+
+    reloaded = PerceptualHashCache(max_distance=4, path=path, namespace="vit:torch")
+    assert reloaded.get(phash) == ({"Sneaking": 0.9}, 0)
+    # A cache saved for another model is ignored
+    assert PerceptualHashCache(path=path, namespace="vit:onnx").get(phash) is None
+
+def test_cache_evicts_oldest_entries():
+    cache = PerceptualHashCache(max_distance=0, max_entries=10, path="")
+    for i in range(11):
+        cache.put(1 << i, i)
+    assert cache.get(1 << 0) is None
+    assert cache.get(1 << 10) == (10, 0)
+
+def test_pages_differing_only_in_the_banner_are_not_merged(monkeypatch):
+    def page(with_reject_button):
+        img = Image.new("RGB", (1280, 720), (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 0, 1280, 80), fill=(20, 20, 60))
+        draw.rectangle((0, 560, 1280, 720), fill=(30, 30, 30))
+        draw.rectangle((1000, 610, 1200, 670), fill=(0, 120, 255))
+        if with_reject_button:
+            draw.rectangle((780, 610, 980, 670), fill=(0, 120, 255))
+        return img
+    pages = [page(False), page(True)]
+    # dHash cannot tell these banners apart, which is why the cache is opt-in
+    assert dhash(pages[0]) == dhash(pages[1])
+
+    calls = []
+    async def fake_classify(img):
+        calls.append(img)
+        return {"Misdirection": 0.9 if len(calls) == 1 else 0.1}
+    monkeypatch.setattr(scan, "classify_dark_pattern", fake_classify)
+    async def main():
+        return [await scan.classify_screenshot(img) for img in pages]
+    results = asyncio.run(main())
+    assert calls == pages
+    assert [probs["Misdirection"] for probs, _ in results] == [0.9, 0.1]
+    assert not any(info["hit"] for _, info in results)
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from politeness import HostScheduler, RobotsCache, RobotsDisallowed
+
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /private
+Crawl-delay: 1
+"""
+
+def make_robots(calls):
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        if request.url.host == "polite.example":
+            return httpx.Response(200, text=ROBOTS_TXT)
+        return httpx.Response(404)
+    return RobotsCache(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+def test_robots_cache_fetches_once_per_origin():
+    async def main():
+        calls = []
+        robots = make_robots(calls)
+        results = await asyncio.gather(
+            robots.can_fetch("https://polite.example/"),
+            robots.can_fetch("https://polite.example/private/page"),
+            robots.can_fetch("https://other.example/private/page"),
+        )
+        assert results == [True, False, True]
+        assert await robots.crawl_delay("https://polite.example/") == 1.0
+        assert calls == ["https://polite.example/robots.txt", "https://other.example/robots.txt"]
+        await robots.aclose()
+    asyncio.run(main())
+
+def test_scheduler_limits_per_host_but_not_across_hosts():
+    async def main():
+        scheduler = HostScheduler(host_concurrency=1, min_delay_ms=0, global_concurrency=10, robots=make_robots([]))
+        starts = {}
+
+        async def scan(url):
+            async with scheduler.slot(url):
+                starts.setdefault(url.split("/")[2], []).append(time.monotonic())
+                await asyncio.sleep(0.05)
+
+        began = time.monotonic()
+        await asyncio.gather(*(scan(f"https://polite.example/{i}") for i in range(2)), *(scan(f"https://other{i}.example/") for i in range(5)))
+        polite = starts["polite.example"]
+        # Crawl-delay spaces out starts on the polite host
+        assert all(b - a >= 0.95 for a, b in zip(polite, polite[1:]))
+        # Other hosts start immediately, in parallel
+        assert all(starts[f"other{i}.example"][0] - began < 0.1 for i in range(5))
+
+        with pytest.raises(RobotsDisallowed):
+            async with scheduler.slot("https://polite.example/private/x"):
+                pass
+        await scheduler.aclose()
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+
+from conditions import CHECKS
+from features import build_features
+from rule_engine import RULE_PACKS_DIR, Rule, RuleCompileError, RuleRegistry, evaluate_rules
+
+def write_pack(path, rules):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"name": "test", "version": "1.0.0", "rules": rules}, f)
+
+def test_registry_reloads_changed_packs(tmp_path):
+    community = tmp_path / "community"
+    community.mkdir()
+    write_pack(tmp_path / "base.json", [{"id": "no_banner", "severity": "high", "test": "!cookie_banner_detected"}])
+    registry = RuleRegistry(dirs=[str(tmp_path), str(community)], poll_interval_s=0)
+    first = registry.snapshot()
+    assert [r.id for r in first.rules] == ["no_banner"]
+    assert registry.snapshot() is first
+
+    write_pack(community / "extra.json", [{"id": "has_cookies", "severity": "low", "test": "length(cookies) > `0`"}])
+    (tmp_path / "broken.json").write_text("{not json")
+    second = registry.snapshot()
+    assert second is not first and second.version != first.version
+    assert [r.id for r in second.rules] == ["no_banner", "has_cookies"]
+    assert list(second.errors) == [os.path.join(str(tmp_path), "broken.json")]
+    # An evaluation that started on the old snapshot keeps its rules
+    assert [v["id"] for v in evaluate_rules({"cookie_banner_detected": False, "cookies": [1]}, list(first.rules))] == ["no_banner"]
+
+def test_pack_that_fails_to_reload_keeps_its_last_good_rules(tmp_path):
+    pack = tmp_path / "base.json"
+    write_pack(pack, [{"id": "no_banner", "severity": "high", "test": "!cookie_banner_detected"}])
+    registry = RuleRegistry(dirs=[str(tmp_path)], poll_interval_s=0)
+    first = registry.snapshot()
+    # Caught mid-write by the poll
+    pack.write_text('{"name": "test", "rules": [')
+    second = registry.snapshot()
+    assert second is not first
+    assert [r.id for r in second.rules] == ["no_banner"]
+    assert second.version == first.version
+    assert list(second.errors) == [str(pack)]
+
+    write_pack(pack, [{"id": "no_banner", "severity": "high", "test": "!cookie_banner_detected"},
+                      {"id": "has_cookies", "severity": "low", "test": "length(cookies) > `0`"}])
+    third = registry.snapshot()
+    assert [r.id for r in third.rules] == ["no_banner", "has_cookies"]
+    assert third.version != first.version and not third.errors
+
+def test_deeply_nested_rules_do_not_break_loading(tmp_path):
+    community = tmp_path / "community"
+    community.mkdir()
+    write_pack(tmp_path / "base.json", [{"id": "no_banner", "severity": "high", "test": "!cookie_banner_detected"}])
+    write_pack(community / "nested.json", [
+        {"id": "deep_python", "severity": "low", "test": "-" * 1990 + "1", "test_type": "python"},
+        {"id": "deep_jmespath", "severity": "low", "test": "!" * 1990 + "cookies"},
+    ])
+    (community / "deep.json").write_text("[" * 100000 + "]" * 100000)
+    snapshot = RuleRegistry(dirs=[str(tmp_path), str(community)]).snapshot()
+    assert [r.id for r in snapshot.rules] == ["no_banner"]
+    nested = os.path.join(str(community), "nested.json")
+    assert sorted(snapshot.errors) == [os.path.join(str(community), "deep.json"), f"{nested}#deep_jmespath", f"{nested}#deep_python"]
+
+def test_compile_errors_are_reported_per_rule_at_load(tmp_path):
+    write_pack(tmp_path / "pack.json", [
+        {"id": "ok", "severity": "low", "test": "length(cookies) > `1`"},
+        {"id": "bad_jmespath", "severity": "low", "test": "cookies[?"},
+        {"id": "bad_python", "severity": "low", "test": "len(result[", "test_type": "python"},
+        {"id": "py", "severity": "low", "test": "len(result['cookies']) > 1", "test_type": "python"},
+    ])
+    snapshot = RuleRegistry(dirs=[str(tmp_path)]).snapshot()
+    assert [r.id for r in snapshot.rules] == ["ok", "py"]
+    pack = os.path.join(str(tmp_path), "pack.json")
+    assert sorted(snapshot.errors) == [f"{pack}#bad_jmespath", f"{pack}#bad_python"]
+    assert [r.evaluate({"cookies": [1, 2]}) for r in snapshot.rules] == [True, True]
+    with pytest.raises(RuleCompileError):
+        Rule("bad", "", "low", "a ==", "jmespath")
+
+def test_shipped_condition_packs_load_and_evaluate():
+    snapshot = RuleRegistry().snapshot()
+    assert not snapshot.errors
+    rules = {r.id: r for r in snapshot.rules}
+    assert {"missing_cookie_consent_banner", "cookies_before_consent"} <= set(rules)
+    compliant = {"cookie_banner_detected": True, "cookies": []}
+    assert evaluate_rules(compliant, list(snapshot.rules)) == []
+    violating = {"cookie_banner_detected": False, "cookies": [{"name": "_ga", "domain": ".example.com"}]}
+    assert {v["id"] for v in evaluate_rules(violating, list(snapshot.rules))} == {"missing_cookie_consent_banner", "cookies_before_consent"}
+
+def test_condition_types():
+    result = {
+        "cookies": [{"name": "_ga", "domain": ".example.com"}],
+        "third_party_domains": ["connect.facebook.net", "cdn.example.net"],
+        "script_hashes": [{"script_url": "https://www.googletagmanager.com/gtm.js?id=GTM-1", "sha256": "a" * 64}],
+        "robots_meta": "noindex, nofollow",
+    }
+    def violated(condition):
+        return Rule("r", "", "low", test_type="condition", condition=condition).evaluate(result)
+    assert violated({"type": "cookie_presence", "value": False, "names": ["_GA"]})
+    assert not violated({"type": "cookie_presence", "value": False, "names": ["_fbp"]})
+    assert violated({"type": "third_party_domain", "value": False, "domains": ["facebook.net"]})
+    assert not violated({"type": "third_party_domain", "value": False, "domains": ["book.net"]})
+    assert violated({"type": "script_presence", "value": False, "scripts": ["googletagmanager.com"]})
+    assert violated({"type": "script_presence", "value": False, "scripts": ["/gtm.js"]})
+    assert violated({"type": "script_presence", "value": False, "scripts": ["a" * 64]})
+    assert not violated({"type": "script_presence", "value": False, "scripts": ["hotjar.com"]})
+    assert violated({"type": "robots_meta", "value": False, "directive": "noindex"})
+    assert not violated({"type": "robots_meta", "value": False, "directive": "noarchive"})
+    for bad in [{"type": "cookie_banner"}, {"type": "exec", "value": True}, {"type": "script_presence", "value": False}]:
+        with pytest.raises(RuleCompileError):
+            Rule("bad", "", "low", test_type="condition", condition=bad)
+
+def test_schema_lists_every_condition_type():
+    with open(os.path.join(RULE_PACKS_DIR, "schema.json"), encoding="utf-8") as f:
+        schema = json.load(f)
+    condition = schema["properties"]["rules"]["items"]["properties"]["condition"]
+    assert set(condition["properties"]["type"]["enum"]) == set(CHECKS)
+
+def test_feature_view_backs_every_rule_format():
+    result = {
+        "cookies": [{"name": "_ga", "domain": ".example.com"}, {"name": "_gid", "domain": ".example.com"}],
+        "network_requests": ["https://www.example.com/", "https://connect.facebook.net/en_US/fbevents.js", "https://www.facebook.com/tr?id=1"],
+        "third_party_domains": ["connect.facebook.net", "www.facebook.com"],
+        "script_hashes": [{"script_url": "https://connect.facebook.net/en_US/fbevents.js", "sha256": "b" * 64}],
+        "robots_meta": "NoIndex",
+    }
+    features = build_features(result)
+    assert features["cookie_domains"] == {"example.com": 2}
+    assert features["registrable_domains"] == {"example.com": 1, "facebook.net": 1, "facebook.com": 1}
+    assert "facebook.net" in features["third_party_parents"]
+    assert features["robots_directives"] == {"noindex": True}
+    assert features["counts"]["requests"] == 3
+    rules = [
+        Rule("jmespath", "", "low", "features.registrable_domains.\"facebook.net\" > `0`"),
+        Rule("python", "", "low", "'_ga' in features.cookie_names and features.counts.scripts == 1", "python"),
+        Rule("condition", "", "low", test_type="condition", condition={"type": "script_presence", "value": False, "scripts": ["facebook.net"]}),
+        Rule("clean", "", "low", "features.cookie_names._fbp"),
+    ]
+    assert [v["id"] for v in evaluate_rules(result, rules)] == ["jmespath", "python", "condition"]
+    assert rules[0].evaluate(result)
@@ -0,0 +1,54 @@
+import pytest
+
+from safe_expr import BudgetExceeded, SafeExprError, compile_expression
+
+RESULT = {
+    "cookie_banner_detected": False,
+    "cookies": [{"name": "_ga", "domain": ".example.com"}, {"name": "session", "domain": "example.com"}],
+    "third_party_domains": ["www.google-analytics.com"],
+}
+
+@pytest.mark.parametrize("source, expected", [
+    ("not result.cookie_banner_detected", True),
+    ("len(result['cookies']) > 1 and result.cookies[0].name == '_ga'", True),
+    ("any(c.name == '_fbp' for c in result.cookies)", False),
+    ("all(c.domain.endswith('example.com') for c in result.cookies)", None),
+    ("'www.google-analytics.com' in result.third_party_domains", True),
+    ("[c.name for c in result.cookies if c.name not in ['session']] == ['_ga']", True),
+    ("0 < len(result.cookies) <= 2", True),
+])
+def test_whitelisted_expressions(source, expected):
+    if expected is None:
+        # Method calls are outside the whitelist
+        with pytest.raises(SafeExprError):
+            compile_expression(source)
+    else:
+        assert compile_expression(source)(RESULT) is expected
+
+@pytest.mark.parametrize("source", [
+    "__import__('os').system('true')",
+    "result.__class__.__mro__",
+    "open('/etc/passwd')",
+    "(lambda: 1)()",
+    "[x for x in result.cookies for y in result.cookies]",
+    "result.cookies[0:1]",
+    "result.cookies * 1000000",
+    "{'a': 1}",
+])
+def test_everything_else_is_rejected_at_compile_time(source):
+    with pytest.raises(SafeExprError):
+        compile_expression(source)
+
+@pytest.mark.parametrize("source", ["-" * 1990 + "1", "not " * 400 + "result", "result" + ".a" * 600])
+def test_deeply_nested_expressions_are_rejected(source):
+    with pytest.raises(SafeExprError):
+        compile_expression(source)
+
+def test_step_budget_and_time_limit():
+    big = {"items": list(range(1000))}
+    quadratic = "any(any(a == b and a < 0 for b in result.items) for a in result.items)"
+    with pytest.raises(BudgetExceeded, match="step"):
+        compile_expression(quadratic, max_steps=10000)(big)
+    with pytest.raises(BudgetExceeded, match="time"):
+        compile_expression(quadratic, max_steps=10 ** 9, time_limit_ms=1)(big)
+    assert compile_expression("len(result.items) == 1000", max_steps=1)(big) is True
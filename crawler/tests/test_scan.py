@@ -1,7 +1,11 @@
 import pytest
 import asyncio
-from scan import run_scan
+import hashlib
+import httpx
+import scan
+from scan import run_scan, diff_persona_results, classify_banner_regions, fetch_scripts, get_script_client, resource_blocker, store_artifacts
 import http.server, socketserver, threading, time as t
+import functools
 from unittest.mock import patch
 from PIL import Image
 
@@ -45,6 +49,38 @@ async def test_run_scan_delayed_js_cookie_banner(tmp_path):
         httpd.shutdown()
         thread.join()
 
+@pytest.mark.asyncio
+async def test_run_scan_banner_settled_wait(tmp_path):
+    html = '''
+    <html><head><title>Test</title></head><body>
+    <script>
+    setTimeout(function() {
+      var div = document.createElement('div');
+      div.className = 'cookie-banner';
+      div.innerText = 'We use cookies!';
+      document.body.appendChild(div);
+    }, 500);
+    setInterval(function() { fetch('/poll').catch(function() {}); }, 200);
+    </script>
+    </body></html>
+    '''
+    file = tmp_path / "settled.html"
+    file.write_text(html)
+    Handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=str(tmp_path))
+    httpd = socketserver.TCPServer(("", 8002), Handler)
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        url = f"http://localhost:8002/{file.name}"
+        result = await run_scan(url, timeout=10000, wait_strategy="banner_settled")
+        assert result["cookie_banner_detected"]
+        assert result["wait"]["strategy"] == "banner_settled"
+        assert result["wait"]["reason"] == "banner_stable"
+    finally:
+        httpd.shutdown()
+        thread.join()
+
 @pytest.mark.asyncio
 async def test_run_scan_non_http_url():
     with pytest.raises(ValueError):
@@ -54,13 +90,128 @@ async def test_run_scan_non_http_url():
 
 @pytest.mark.asyncio
 async def test_dark_pattern_violation(monkeypatch, tmp_path):
-    def fake_classify(img):
+    async def fake_classify(img):
         return {"Confirmshaming": 0.95, "Misdirection": 0.02, "Sneaking": 0.03}
-    with patch("dark_pattern.classify", fake_classify):
-        html = "<html><body><h1>Test</h1></body></html>"
+    # The page has no consent UI, which the text prefilter would settle without the model
+    monkeypatch.setattr("scan.DARK_PATTERN_PREFILTER", False)
+    # scan.py holds its own reference to the async classifier
+    monkeypatch.setattr("scan.classify_dark_pattern", fake_classify)
+    html = "<html><body><h1>Test</h1></body></html>"
+    file = tmp_path / "test.html"
+    file.write_text(html)
+    url = f"file://{file}"
+    result = await run_scan(url)
+    violations = result.get("violations", [])
+    assert any(v["id"] == "dark_confirmshaming" for v in violations)
+
+def failing_artifact_store():
+    raise RuntimeError("boto3 is required for the s3 artifact backend")
+
+def test_unavailable_artifact_store_drops_artifacts(monkeypatch):
+    monkeypatch.setattr("scan.get_artifact_store", failing_artifact_store)
+    artifacts = asyncio.run(store_artifacts({"html": b"<html></html>", "screenshot": b"png"}))
+    assert artifacts == {"html": None, "screenshot": None}
+
+@pytest.mark.asyncio
+async def test_scan_completes_without_artifact_store(monkeypatch, tmp_path):
+    monkeypatch.setattr("scan.get_artifact_store", failing_artifact_store)
+    file = tmp_path / "test.html"
+    file.write_text("<html><body><h1>Test</h1></body></html>")
+    result = await run_scan(f"file://{file}")
+    assert result["artifacts"] == {"html": None, "screenshot": None}
+
+@pytest.mark.asyncio
+async def test_roi_mode_skips_inference_without_visible_banner():
+    hidden = [{"selector": "#cookie-banner", "visible": False, "box": {"x": 0, "y": 0, "width": 0, "height": 0}, "z_index": None}]
+    with patch("scan.classify_dark_pattern", side_effect=AssertionError("classifier must not run")):
+        probs, cache_info = await classify_banner_regions(None, hidden)
+    assert probs == {}
+    assert cache_info["regions"] == 0
+
+@pytest.mark.asyncio
+async def test_roi_scan_without_banner_reports_no_banner_stage(monkeypatch, tmp_path):
+    monkeypatch.setattr("scan.DARK_PATTERN_PREFILTER", False)
+    with patch("scan.classify_dark_pattern", side_effect=AssertionError("classifier must not run")):
         file = tmp_path / "test.html"
-        file.write_text(html)
-        url = f"file://{file}"
-        result = await run_scan(url)
-        violations = result.get("violations", [])
-        assert any(v["id"] == "dark_confirmshaming" for v in violations) 
\ No newline at end of file
+        file.write_text("<html><body><h1>No banner here</h1></body></html>")
+        result = await run_scan(f"file://{file}", classify_mode="roi")
+    assert result["dark_pattern_stage"] == "no_banner"
+
+def test_diff_persona_results():
+    def result(banner, cookies, domains, violations):
+        return {
+            "cookie_banner_detected": banner,
+            "cookies": [{"name": c} for c in cookies],
+            "third_party_domains": domains,
+            "violations": [{"id": v} for v in violations],
+        }
+    results = {
+        "EU_adult": result(True, ["session"], ["cdn.example.net"], []),
+        "US_adult": result(False, ["session", "_fbp"], ["cdn.example.net", "connect.facebook.net"], ["missing_cookie_consent_banner"]),
+        "EU_child": {"url": "https://example.com", "persona_id": "EU_child", "error": "timeout"},
+    }
+    diff = diff_persona_results(results)
+    assert diff["cookie_banner_detected"] == {"EU_adult": True, "US_adult": False}
+    assert diff["cookies"] == {"US_adult": ["_fbp"]}
+    assert diff["third_party_domains"] == {"US_adult": ["connect.facebook.net"]}
+    assert diff["violations"] == {"US_adult": ["missing_cookie_consent_banner"]}
+
+def test_fetch_scripts_hashes_bodies_on_shared_client(monkeypatch):
+    bodies = {"/a.js": b"console.log('a')", "/b.js": b"x" * 70000}
+    def handler(request):
+        if request.url.path in bodies:
+            return httpx.Response(200, content=bodies[request.url.path])
+        raise httpx.ConnectError("unreachable", request=request)
+
+    async def main():
+        client = await get_script_client()
+        assert await get_script_client() is client
+        # Swap in a mock transport on the shared client for this loop
+        monkeypatch.setattr(scan, "_script_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        fetched = await fetch_scripts(["https://cdn.example/a.js", "https://cdn.example/b.js", "https://down.example/c.js"])
+        await scan.close_script_client()
+        await client.aclose()
+        return fetched
+    fetched = asyncio.run(main())
+    assert fetched == {
+        f"https://cdn.example{path}": {"sha256": hashlib.sha256(body).hexdigest(), "response_size": len(body)}
+        for path, body in bodies.items()
+    }
+
+def test_script_client_is_closed_when_the_event_loop_changes():
+    first = asyncio.run(get_script_client())
+    async def main():
+        second = await get_script_client()
+        await scan.close_script_client()
+        return second
+    second = asyncio.run(main())
+    assert second is not first
+    assert first.is_closed
+
+class FakeRoute:
+    def __init__(self, resource_type):
+        self.request = type("Request", (), {"resource_type": resource_type})()
+        self.outcome = None
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+    async def fulfill(self, **kwargs):
+        self.outcome = ("fulfilled", kwargs["content_type"])
+
+    async def abort(self, error_code=None):
+        self.outcome = ("aborted", error_code)
+
+def test_resource_blocker_stubs_images_and_aborts_heavy_media():
+    blocked = {}
+    block = resource_blocker(blocked)
+    routes = {rtype: FakeRoute(rtype) for rtype in ("document", "script", "image", "font", "media")}
+    async def main():
+        for route in routes.values():
+            await block(route)
+        await block(FakeRoute("image"))
+    asyncio.run(main())
+    assert routes["document"].outcome == routes["script"].outcome == "continued"
+    assert routes["image"].outcome == ("fulfilled", "image/gif")
+    assert routes["font"].outcome == routes["media"].outcome == ("aborted", "blockedbyclient")
+    assert blocked == {"image": 2, "font": 1, "media": 1}
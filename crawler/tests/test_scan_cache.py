@@ -0,0 +1,81 @@
+import pytest
+import httpx
+from scan import persona_request_headers
+from scan_cache import ScanCache, MemoryCacheTier, cache_key
+
+def make_scan(calls, etag='"v1"'):
+    async def scan_fn():
+        calls.append(1)
+        return {"url": "https://example.com/", "score": 70, "document": {"etag": etag, "last_modified": None}}
+    return scan_fn
+
+def test_cache_key_normalizes_url():
+    a = cache_key("https://Example.com:443/shop/?utm_source=x&b=2&a=1", "EU_adult", "v1")
+    b = cache_key("https://example.com/shop?a=1&b=2", "EU_adult", "v1")
+    assert a == b
+    assert a != cache_key("https://example.com/shop?a=1&b=2", "US_adult", "v1")
+    assert a != cache_key("https://example.com/shop?a=1&b=2", "EU_adult", "v2")
+
+@pytest.mark.asyncio
+async def test_fresh_entry_is_served_from_cache():
+    calls = []
+    cache = ScanCache(ttl_seconds=60)
+    payload, info = await cache.get_or_scan("k", "https://example.com/", make_scan(calls))
+    assert not info["hit"]
+    payload, info = await cache.get_or_scan("k", "https://example.com/", make_scan(calls))
+    assert info["hit"] and payload["score"] == 70
+    await cache.get_or_scan("k", "https://example.com/", make_scan(calls), force_refresh=True)
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_stale_entry_is_revalidated_before_rescan():
+    seen = []
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        return httpx.Response(304)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    calls = []
+    cache = ScanCache(ttl_seconds=60, client=client)
+    await cache.get_or_scan("k", "https://example.com/", make_scan(calls))
+    payload, info = await cache.get_or_scan("k", "https://example.com/", make_scan(calls), max_age=0)
+    assert info == {"hit": True, "revalidated": True, "age_s": 0}
+    assert seen == ['"v1"']
+    assert len(calls) == 1
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_changed_page_triggers_rescan():
+    client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, headers={"etag": '"v2"'})))
+    calls = []
+    cache = ScanCache(ttl_seconds=60, client=client)
+    await cache.get_or_scan("k", "https://example.com/", make_scan(calls))
+    _, info = await cache.get_or_scan("k", "https://example.com/", make_scan(calls), max_age=0)
+    assert not info["hit"]
+    assert len(calls) == 2
+    await client.aclose()
+
+@pytest.mark.asyncio
+async def test_revalidation_identifies_as_the_persona():
+    seen = []
+    def handler(request):
+        seen.append((request.headers.get("user-agent"), request.headers.get("accept-language")))
+        return httpx.Response(304)
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    calls = []
+    cache = ScanCache(ttl_seconds=60, client=client)
+    headers = persona_request_headers({"headers": {"Accept-Language": "de-DE"}})
+    await cache.get_or_scan("k", "https://example.com/", make_scan(calls), headers=headers)
+    _, info = await cache.get_or_scan("k", "https://example.com/", make_scan(calls), max_age=0, headers=headers)
+    assert info["revalidated"]
+    assert seen == [(headers["User-Agent"], "de-DE")]
+    # A persona whose request cannot be reproduced is rescanned instead
+    _, info = await cache.get_or_scan("k", "https://example.com/", make_scan(calls), max_age=0, revalidate=False)
+    assert not info["hit"] and len(seen) == 1 and len(calls) == 2
+    await client.aclose()
+
+def test_memory_tier_is_bounded():
+    tier = MemoryCacheTier(max_entries=2)
+    for key in "abc":
+        tier.set(key, object())
+    assert tier.get("a") is None
+    assert tier.get("c") is not None
@@ -0,0 +1,56 @@
+import asyncio
+
+import script_store
+from script_store import ScriptWriteBuffer
+
+def rows(n, scan_id="s"):
+    return [{"scan_id": scan_id, "domain": "example.com", "script_url": f"https://example.com/{i}.js", "sha256": "0" * 64, "response_size": i} for i in range(n)]
+
+def test_buffer_flushes_once_enough_rows_are_pending(monkeypatch):
+    batches = []
+    monkeypatch.setattr(script_store, "write_scan_scripts", lambda batch: batches.append(len(batch)))
+    async def main():
+        buffer = ScriptWriteBuffer(flush_rows=5, flush_interval_ms=60000, max_pending_scans=10)
+        buffer.start()
+        await buffer.put(rows(3, "a"))
+        await buffer.put(rows(3, "b"))
+        await asyncio.sleep(0.05)
+        flushed_by_size = list(batches)
+        await buffer.put(rows(2, "c"))
+        await buffer.stop()
+        return flushed_by_size
+    assert asyncio.run(main()) == [6]
+    # Stopping flushes whatever is still pending
+    assert batches == [6, 2]
+
+def test_buffer_flushes_after_the_interval(monkeypatch):
+    batches = []
+    monkeypatch.setattr(script_store, "write_scan_scripts", lambda batch: batches.append(len(batch)))
+    async def main():
+        buffer = ScriptWriteBuffer(flush_rows=1000, flush_interval_ms=50, max_pending_scans=10)
+        buffer.start()
+        await buffer.put(rows(2))
+        assert batches == []
+        await asyncio.sleep(0.2)
+        flushed_by_time = list(batches)
+        await buffer.stop()
+        return flushed_by_time
+    assert asyncio.run(main()) == [2]
+    assert batches == [2]
+
+def test_failed_flush_does_not_stop_the_buffer(monkeypatch):
+    batches = []
+    def write(batch):
+        batches.append(len(batch))
+        if len(batches) == 1:
+            raise RuntimeError("database unavailable")
+    monkeypatch.setattr(script_store, "write_scan_scripts", write)
+    async def main():
+        buffer = ScriptWriteBuffer(flush_rows=2, flush_interval_ms=60000, max_pending_scans=10)
+        buffer.start()
+        await buffer.put(rows(2))
+        await asyncio.sleep(0.05)
+        await buffer.put(rows(3))
+        await buffer.stop()
+    asyncio.run(main())
+    assert batches == [2, 3]
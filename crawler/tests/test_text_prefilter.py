@@ -0,0 +1,30 @@
+from text_prefilter import AhoCorasick, button_role, evaluate_fixtures, normalize_text, score_consent
+
+def test_automaton_matches_whole_words_only():
+    automaton = AhoCorasick({"agree": "accept", "disagree": "reject", "no thanks": "reject", "thanks, i don't": "shame"})
+    assert automaton.search("i disagree") == [("disagree", "reject")]
+    assert sorted(automaton.search("no thanks, i don't")) == [("no thanks", "reject"), ("thanks, i don't", "shame")]
+    assert automaton.search("agreement") == []
+
+def test_normalization_folds_accents_and_apostrophes():
+    assert normalize_text("  Non merci,\nje préfère ") == "non merci, je prefere"
+    assert normalize_text("I DON’T care") == "i don't care"
+    assert button_role("Continuer sans accepter") == "reject"
+    assert button_role("Não me importo com a minha privacidade") == "reject"
+    assert button_role("Alle akzeptieren") == "accept"
+
+def test_symmetric_banner_skips_the_vision_model():
+    filled = {"visible": True, "width": 160, "height": 44, "background": "rgb(0, 102, 204)", "font_size": 16, "opacity": 1}
+    result = score_consent({
+        "text": "We use cookies. Accept all Reject all",
+        "buttons": [dict(filled, text="Accept all"), dict(filled, text="Reject all")],
+        "checkboxes": [{"checked": True, "disabled": True, "label": "Necessary"}],
+    })
+    assert result["decision"] == "negative"
+    assert score_consent(None)["decision"] == "negative"
+
+def test_fixture_recall():
+    report = evaluate_fixtures()
+    assert all(recall >= 0.9 for recall in report["recall"].values())
+    assert report["false_positive_rate"] == 0.0
+    assert report["skip_rate"] >= 0.8
@@ -0,0 +1,238 @@
+"""
+First-stage dark-pattern detector over consent-banner text and button styles.
+
+Scores the consent data collected by the DOM probe (banner text, buttons
+with their computed styles, checkboxes) with an Aho-Corasick automaton over
+the phrase lists in dark_pattern_phrases.json (en, fr, de, pt, the languages
+of policy_templates) and a few style heuristics. Scans only fall through to
+the vision model when these scores are inconclusive.
+
+Usage: python text_prefilter.py [fixture.json]   (reports recall on a labeled fixture set)
+"""
+import json
+import os
+import re
+import sys
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from dark_pattern import LABELS
+
+PHRASES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dark_pattern_phrases.json")
+DEFAULT_FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures", "consent_banners.json")
+DARK_PATTERN_PREFILTER = os.getenv("DARK_PATTERN_PREFILTER", "true").lower() == "true"
+# Scores at or below LOW are confidently clean, at or above HIGH confidently a dark pattern;
+# anything in between goes to the vision model
+PREFILTER_LOW = float(os.getenv("PREFILTER_LOW", "0.3"))
+PREFILTER_HIGH = float(os.getenv("PREFILTER_HIGH", "0.7"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case, accent-free, single-spaced text with straight apostrophes."""
+    text = unicodedata.normalize("NFKD", text.lower().replace("’", "'").replace(" ", " "))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: one pass over the text finds every occurrence of
+    every phrase, whatever the number of phrases. Matches must start and end
+    at word boundaries.
+    """
+
+    def __init__(self, phrases: Dict[str, str]):
+        # phrase -> tag; states are dicts of transitions, with parallel fail and output lists
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str]]] = [[]]
+        for phrase, tag in phrases.items():
+            state = 0
+            for ch in phrase:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append((phrase, tag))
+        # Breadth-first fail links; states one character deep fail back to the root
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> List[Tuple[str, str]]:
+        """(phrase, tag) for each whole-word match in `text` (already normalized)."""
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for phrase, tag in self._out[state]:
+                start = i - len(phrase) + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (i + 1 == len(text) or not text[i + 1].isalnum()):
+                    matches.append((phrase, tag))
+        return matches
+
+
+@lru_cache(maxsize=1)
+def get_automaton() -> AhoCorasick:
+    with open(PHRASES_PATH, encoding="utf-8") as f:
+        languages = json.load(f)
+    phrases: Dict[str, str] = {}
+    for groups in languages.values():
+        for group, items in groups.items():
+            for phrase in items:
+                phrases.setdefault(normalize_text(phrase), group)
+    return AhoCorasick(phrases)
+
+
+def button_role(text: str) -> Optional[str]:
+    """'accept', 'reject' or 'settings' for a button label, or None."""
+    matches = get_automaton().search(normalize_text(text))
+    # The longest matching phrase decides ("continue without accepting" is a reject, not "continue")
+    for phrase, tag in sorted(matches, key=lambda m: -len(m[0])):
+        if tag == "confirmshaming":
+            # A shaming label is still the way to decline
+            return "reject"
+        if tag in ("accept", "reject", "settings"):
+            return tag
+    return None
+
+
+def _is_filled(button: dict) -> bool:
+    bg = (button.get("background") or "").replace(" ", "")
+    return bool(bg) and bg not in ("transparent", "rgba(0,0,0,0)")
+
+
+def _area(button: dict) -> float:
+    return float(button.get("width") or 0) * float(button.get("height") or 0)
+
+
+def _misdirection(buttons: List[dict], signals: List[str]) -> float:
+    accepts = [b for b in buttons if b["role"] == "accept" and b.get("visible", True)]
+    rejects = [b for b in buttons if b["role"] == "reject"]
+    if not accepts:
+        return 0.0
+    accept = max(accepts, key=_area)
+    if not rejects:
+        if any(b["role"] == "settings" for b in buttons):
+            # Reject only behind a second layer: common, but not conclusive on its own
+            signals.append("reject_behind_settings")
+        else:
+            signals.append("no_reject_option")
+        return 0.5
+    visible_rejects = [b for b in rejects if b.get("visible", True)]
+    if not visible_rejects:
+        signals.append("reject_hidden")
+        return 0.9
+    reject = max(visible_rejects, key=_area)
+    score = 0.0
+    if _is_filled(accept) and not _is_filled(reject):
+        signals.append("reject_unstyled")
+        score += 0.35
+    if reject.get("font_size") and accept.get("font_size") and reject["font_size"] < 0.85 * accept["font_size"]:
+        signals.append("reject_smaller_text")
+        score += 0.2
+    if _area(accept) and _area(reject) < 0.5 * _area(accept):
+        signals.append("reject_smaller_target")
+        score += 0.25
+    if float(reject.get("opacity", 1)) < 0.8:
+        signals.append("reject_faded")
+        score += 0.2
+    if reject.get("tag") == "a" and accept.get("tag") != "a":
+        signals.append("reject_as_link")
+        score += 0.15
+    return round(min(1.0, score), 2)
+
+
+def score_consent(consent: Optional[dict]) -> dict:
+    """
+    Scores in [0, 1] per dark-pattern label for the consent data gathered by
+    the DOM probe, plus the decision: "negative" or "positive" when the
+    scores are conclusive, "uncertain" when the vision model should decide.
+    """
+    if not consent or not (consent.get("text") or consent.get("buttons")):
+        # No consent UI on the page: nothing for either stage to find
+        return {"scores": {label: 0.0 for label in LABELS}, "decision": "negative", "matches": [], "signals": ["no_consent_ui"]}
+    automaton = get_automaton()
+    buttons = [dict(b, role=button_role(b.get("text") or "")) for b in consent.get("buttons", [])]
+    texts = [consent.get("text") or ""] + [b.get("text") or "" for b in buttons]
+    matches = sorted({m for text in texts for m in automaton.search(normalize_text(text))})
+    signals: List[str] = []
+
+    shaming = [phrase for phrase, tag in matches if tag == "confirmshaming"]
+    pressure = [phrase for phrase, tag in matches if tag == "pressure"]
+    confirmshaming = 0.9 if shaming else (0.5 if pressure else 0.0)
+
+    misdirection = _misdirection(buttons, signals)
+
+    prechecked = [c for c in consent.get("checkboxes", []) if c.get("checked") and not c.get("disabled")]
+    if prechecked:
+        signals.append("prechecked_optional_consent")
+    sneaking = 0.8 if prechecked else 0.0
+
+    scores = {"Confirmshaming": confirmshaming, "Misdirection": misdirection, "Sneaking": sneaking}
+    if any(score >= PREFILTER_HIGH for score in scores.values()):
+        decision = "positive"
+    elif all(score <= PREFILTER_LOW for score in scores.values()):
+        decision = "negative"
+    else:
+        decision = "uncertain"
+    return {
+        "scores": scores,
+        "decision": decision,
+        "matches": [phrase for phrase, tag in matches if tag in ("confirmshaming", "pressure")],
+        "signals": signals,
+    }
+
+
+def evaluate_fixtures(path: str = DEFAULT_FIXTURE_PATH) -> dict:
+    """
+    Recall per label over a labeled fixture set. A positive example counts as
+    recalled when the prefilter flags it or defers it to the vision model;
+    `skip_rate` is the share of examples decided without the vision model.
+    """
+    with open(path, encoding="utf-8") as f:
+        examples = json.load(f)
+    found = {label: 0 for label in LABELS}
+    positives = {label: 0 for label in LABELS}
+    false_positives = 0
+    negatives = 0
+    skipped = 0
+    for example in examples:
+        result = score_consent(example["consent"])
+        skipped += result["decision"] != "uncertain"
+        expected = set(example["labels"])
+        if not expected:
+            negatives += 1
+            false_positives += result["decision"] == "positive"
+        for label in expected:
+            positives[label] += 1
+            if result["decision"] == "uncertain" or result["scores"][label] >= PREFILTER_HIGH:
+                found[label] += 1
+    return {
+        "examples": len(examples),
+        "recall": {label: found[label] / positives[label] for label in LABELS if positives[label]},
+        "false_positive_rate": false_positives / negatives if negatives else 0.0,
+        "skip_rate": skipped / len(examples) if examples else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    report = evaluate_fixtures(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURE_PATH)
+    print(json.dumps(report, indent=2))
@@ -21,7 +21,7 @@ def add_rule_pack(pack_path):
     dest = os.path.join(COMMUNITY_DIR, os.path.basename(pack_path))
     shutil.copy(pack_path, dest)
     print(f"✅ Rule pack added: {dest}")
-    # Optionally reload rule_engine here
+    # Running workers pick the pack up on their next rule-registry poll
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()